@@ -0,0 +1,17 @@
+from app.utils.pubsub import pubsub
+
+async def broadcast_to_conversation(conversation_id: int, frame_type: str, payload: dict,
+                                    user_ids: list[int] | None = None, exclude_user_id: int | None = None):
+    """
+    Publie un événement de conversation à tous les workers (pub/sub Postgres) :
+    chacun le livre aux WebSockets de la conversation qu'il détient.
+    `frame_type` est le type de trame sur la socket multiplexée (message, typing...).
+    `user_ids` restreint les destinataires, `exclude_user_id` en exclut un.
+    """
+    await pubsub.publish("conversation", {
+        "conversation_id": conversation_id,
+        "frame_type": frame_type,
+        "payload": payload,
+        "user_ids": user_ids,
+        "exclude_user_id": exclude_user_id,
+    })
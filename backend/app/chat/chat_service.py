@@ -23,33 +23,94 @@ async def create_conversation(user1_id: int, user2_id: int):
     return conversation_id
 
 async def get_user_conversations_from_db(user_id: int):
+    """
+    Conversations d'un utilisateur en une seule requête, triées par activité récente :
+    interlocuteur, présence d'une photo principale, dernier message (contenu, date,
+    expéditeur), filigrane de lecture et nombre de messages non lus (lus dans
+    conversation_reads, sans comptage). Les paires bloquées ou unlikées
+    (dans un sens ou dans l'autre) sont exclues.
+    """
     query = text("""
-        SELECT c.id AS conversation_id, 
-               u.id AS other_user_id, 
-               u.username AS other_username, 
-               pp.image_data AS profile_picture,
-               u.status AS is_online
-        FROM conversations c
-        JOIN users u ON 
-            (c.user1_id = :user_id AND c.user2_id = u.id) OR
-            (c.user2_id = :user_id AND c.user1_id = u.id)
-        LEFT JOIN profile_pictures pp ON u.id = pp.user_id AND pp.is_profile_picture = TRUE
-        ORDER BY c.created_at DESC
+        WITH my_conversations AS (
+            SELECT id, created_at, user2_id AS other_id FROM conversations WHERE user1_id = :user_id
+            UNION ALL
+            SELECT id, created_at, user1_id AS other_id FROM conversations WHERE user2_id = :user_id
+        )
+        SELECT mc.id AS conversation_id,
+               u.id AS other_user_id,
+               u.username AS other_username,
+               u.status AS is_online,
+               EXISTS (
+                   SELECT 1 FROM profile_pictures pp
+                   WHERE pp.user_id = u.id AND pp.is_profile_picture = TRUE
+               ) AS has_picture,
+               last_message.content AS last_message,
+               last_message.type AS last_message_type,
+               last_message.sender_id AS last_message_sender_id,
+               last_message.timestamp AS last_message_at,
+               COALESCE(reads.last_read_message_id, 0) AS last_read_message_id,
+               COALESCE(reads.unread_count, 0) AS unread_count
+        FROM my_conversations mc
+        JOIN users u ON u.id = mc.other_id
+        LEFT JOIN conversation_reads reads ON reads.conversation_id = mc.id AND reads.user_id = :user_id
+        LEFT JOIN LATERAL (
+            SELECT content, type, sender_id, timestamp FROM messages m
+            WHERE m.conversation_id = mc.id
+            ORDER BY m.id DESC
+            LIMIT 1
+        ) AS last_message ON TRUE
+        WHERE NOT EXISTS (
+            SELECT 1 FROM blocks b
+            WHERE (b.blocker_id = :user_id AND b.blocked_id = u.id)
+               OR (b.blocker_id = u.id AND b.blocked_id = :user_id)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM likes l
+            WHERE ((l.liker_id = :user_id AND l.liked_id = u.id)
+                OR (l.liker_id = u.id AND l.liked_id = :user_id))
+              AND l.unlike
+        )
+        ORDER BY COALESCE(last_message.timestamp, mc.created_at) DESC
     """)
     async with engine.begin() as conn:
         result = await conn.execute(query, {"user_id": user_id})
         return result.fetchall()
 
-async def get_messages_from_conversation(conversation_id: int):
-    query = text("""
+async def get_messages_from_conversation(conversation_id: int, before_id: int | None = None,
+                                         after_id: int | None = None, limit: int | None = None):
+    """
+    Messages d'une conversation, du plus ancien au plus récent (pagination par id,
+    via l'index messages(conversation_id, id)) :
+    - `before_id` : messages plus anciens que cet id (charger l'historique)
+    - `after_id` : messages plus récents que cet id (rattrapage après reconnexion)
+    - `limit` : taille de page ; sans `after_id`, ce sont les `limit` derniers messages.
+    Sans paramètre, toute la conversation est renvoyée.
+    """
+    clauses = ["conversation_id = :conversation_id"]
+    params = {"conversation_id": conversation_id}
+    if before_id is not None:
+        clauses.append("id < :before_id")
+        params["before_id"] = before_id
+    if after_id is not None:
+        clauses.append("id > :after_id")
+        params["after_id"] = after_id
+
+    # Page la plus récente (ou avant before_id) : lue en ordre décroissant puis inversée
+    newest_first = limit is not None and after_id is None
+    query = f"""
         SELECT id, sender_id, content, timestamp, type
-        FROM messages 
-        WHERE conversation_id = :conversation_id 
-        ORDER BY timestamp ASC
-    """)
+        FROM messages
+        WHERE {" AND ".join(clauses)}
+        ORDER BY id {"DESC" if newest_first else "ASC"}
+    """
+    if limit is not None:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+
     async with engine.begin() as conn:
-        result = await conn.execute(query, {"conversation_id": conversation_id})
-        return result.fetchall()
+        result = await conn.execute(text(query), params)
+        rows = result.fetchall()
+    return rows[::-1] if newest_first else rows
 
 async def get_conversation_users(conversation_id: int):
     query = text("""
@@ -60,11 +121,27 @@ async def get_conversation_users(conversation_id: int):
         return result.fetchone()
 
 async def insert_message(conversation_id: int, sender_id: int | None, content: str, type_: str = "text") -> dict:
+    """
+    Insère un message et incrémente, dans la même requête, le compteur de non lus
+    des autres participants (les deux pour un message système sans expéditeur).
+    """
     now = datetime.utcnow()
     query = text("""
-        INSERT INTO messages (conversation_id, sender_id, content, type, timestamp, is_read)
-        VALUES (:conversation_id, :sender_id, :content, :type, :timestamp, FALSE)
-        RETURNING id, timestamp
+        WITH inserted AS (
+            INSERT INTO messages (conversation_id, sender_id, content, type, timestamp, is_read)
+            VALUES (:conversation_id, :sender_id, :content, :type, :timestamp, FALSE)
+            RETURNING id, timestamp
+        ), counted AS (
+            INSERT INTO conversation_reads (conversation_id, user_id, unread_count)
+            SELECT c.id, participant.user_id, 1
+            FROM conversations c
+            CROSS JOIN LATERAL (VALUES (c.user1_id), (c.user2_id)) AS participant(user_id)
+            WHERE c.id = :conversation_id
+              AND participant.user_id IS DISTINCT FROM CAST(:sender_id AS INTEGER)
+            ON CONFLICT (conversation_id, user_id)
+            DO UPDATE SET unread_count = conversation_reads.unread_count + 1
+        )
+        SELECT id, timestamp FROM inserted
     """)
     print(sender_id)
 
@@ -79,6 +156,57 @@ async def insert_message(conversation_id: int, sender_id: int | None, content: s
         return result.fetchone()
 
 
+# Verrou sur la ligne de lecture (créée au besoin) : les messages insérés ensuite attendent
+# la fin de la transaction pour incrémenter le compteur. Aucune ligne si l'utilisateur ne
+# fait pas partie de la conversation.
+LOCK_READ_QUERY = text("""
+    INSERT INTO conversation_reads (conversation_id, user_id)
+    SELECT c.id, CAST(:user_id AS INTEGER)
+    FROM conversations c
+    WHERE c.id = :conversation_id AND :user_id IN (c.user1_id, c.user2_id)
+    ON CONFLICT (conversation_id, user_id) DO UPDATE
+    SET updated_at = conversation_reads.updated_at
+    RETURNING last_read_message_id, unread_count
+""")
+
+# Filigrane avancé (jamais reculé, borné au dernier message de la conversation) et non lus
+# recomptés au-delà du filigrane, en général aucun message, via l'index messages(conversation_id, id).
+# Exécutée après LOCK_READ_QUERY : le recomptage voit tous les messages déjà comptés.
+MARK_READ_QUERY = text("""
+    UPDATE conversation_reads r
+    SET last_read_message_id = target.message_id,
+        unread_count = (
+            SELECT COUNT(*) FROM messages m
+            WHERE m.conversation_id = r.conversation_id
+              AND m.id > target.message_id
+              AND m.sender_id IS DISTINCT FROM r.user_id
+        ),
+        updated_at = NOW()
+    FROM (
+        SELECT LEAST(CAST(:message_id AS INTEGER), COALESCE(MAX(id), 0)) AS message_id
+        FROM messages
+        WHERE conversation_id = :conversation_id
+    ) AS target
+    WHERE r.conversation_id = :conversation_id AND r.user_id = :user_id
+      AND r.last_read_message_id < target.message_id
+    RETURNING r.last_read_message_id, r.unread_count
+""")
+
+async def mark_conversation_read(conversation_id: int, user_id: int, message_id: int) -> dict | None:
+    """
+    Marque la conversation comme lue jusqu'au message `message_id` inclus.
+    Retourne {last_read_message_id, unread_count}, l'état inchangé si le filigrane
+    était déjà plus loin, ou None si l'utilisateur ne fait pas partie de la conversation.
+    """
+    params = {"conversation_id": conversation_id, "user_id": user_id, "message_id": message_id}
+    async with engine.begin() as conn:
+        row = (await conn.execute(LOCK_READ_QUERY, params)).fetchone()
+        if row is None:
+            return None
+        # Pas de mise à jour si le filigrane était déjà au-delà : état verrouillé inchangé
+        row = (await conn.execute(MARK_READ_QUERY, params)).fetchone() or row
+    return {"last_read_message_id": row.last_read_message_id, "unread_count": row.unread_count}
+
 async def insert_date_invite(conversation_id: int, sender_id: int):
     async with engine.begin() as conn:
         await conn.execute(text("""
@@ -0,0 +1,84 @@
+from app.chat.chat_events import broadcast_to_conversation
+import asyncio
+
+TYPING_EXPIRY_SECONDS = 5  # Sans nouvelle frappe pendant ce délai, l'utilisateur n'écrit plus
+TYPING_STOP_DEBOUNCE_SECONDS = 1  # Un « stop » suivi d'une reprise dans ce délai n'est pas diffusé
+
+class TypingCoalescer:
+    """
+    État « en train d'écrire » par (utilisateur, conversation), tenu en mémoire par worker.
+    Les signaux de frappe reçus (trames WebSocket ou POST /chat/typing) sont fusionnés :
+    seules les transitions sont diffusées, soit au plus un événement de début et un
+    de fin par période de frappe. Le « stop » est différé de `stop_debounce` secondes
+    (annulé si la frappe reprend), et un état non rafraîchi expire après `expiry` secondes.
+    """
+
+    def __init__(self, expiry: float = TYPING_EXPIRY_SECONDS, stop_debounce: float = TYPING_STOP_DEBOUNCE_SECONDS):
+        self.expiry = expiry
+        self.stop_debounce = stop_debounce
+        # (user_id, conversation_id) -> (username, timer de fin, stop demandé)
+        self._active: dict[tuple[int, int], tuple[str, asyncio.TimerHandle, bool]] = {}
+        self.received = 0
+        self.coalesced = 0
+        self.started = 0
+        self.stopped = 0
+        self.expired = 0
+
+    async def update(self, user_id: int, username: str, conversation_id: int, is_typing: bool) -> None:
+        """Enregistre un signal de frappe ; ne diffuse que les changements d'état."""
+        self.received += 1
+        key = (user_id, conversation_id)
+        entry = self._active.get(key)
+
+        if is_typing:
+            if entry is not None:
+                entry[1].cancel()
+                self.coalesced += 1
+            self._active[key] = (username, self._arm(key, self.expiry, expired=True), False)
+            if entry is None:
+                self.started += 1
+                await self._emit(user_id, username, conversation_id, True)
+        elif entry is not None and not entry[2]:
+            entry[1].cancel()
+            self._active[key] = (username, self._arm(key, self.stop_debounce, expired=False), True)
+        else:
+            self.coalesced += 1  # Déjà arrêté ou arrêt déjà programmé
+
+    def _arm(self, key: tuple[int, int], delay: float, expired: bool) -> asyncio.TimerHandle:
+        return asyncio.get_running_loop().call_later(delay, self._finish, key, expired)
+
+    def _finish(self, key: tuple[int, int], expired: bool) -> None:
+        entry = self._active.pop(key, None)
+        if entry is None:
+            return
+        if expired:
+            self.expired += 1
+        else:
+            self.stopped += 1
+        user_id, conversation_id = key
+        asyncio.create_task(self._emit(user_id, entry[0], conversation_id, False))
+
+    async def _emit(self, user_id: int, username: str, conversation_id: int, is_typing: bool) -> None:
+        try:
+            await broadcast_to_conversation(conversation_id, "typing", {
+                "event": "typing",
+                "typing": is_typing,
+                "username": username
+            }, exclude_user_id=user_id)  # Ne pas notifier l'auteur lui-même
+        except Exception as e:
+            print(f"⚠️ Erreur lors de la diffusion de la frappe : {e}")
+
+    def stats(self) -> dict:
+        """Compteurs exposés pour mesurer la fusion des signaux de frappe."""
+        return {
+            "active": len(self._active),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "started": self.started,
+            "stopped": self.stopped,
+            "expired": self.expired,
+            "expiry_seconds": self.expiry,
+            "stop_debounce_seconds": self.stop_debounce,
+        }
+
+typing_coalescer = TypingCoalescer()
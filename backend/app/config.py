@@ -20,6 +20,13 @@ class Settings(BaseSettings):
     # frontend_url: str
     frontend_origin: str
 
+    # Classement de la découverte : "lexicographic" (distance > tags > fame) ou "weighted"
+    ranking_strategy: str = "lexicographic"
+    ranking_weights: dict[str, float] = {}  # ex. RANKING_WEIGHTS='{"distance": 0.5}'
+
+    # WebSockets : file d'envoi pleine -> "drop" (message ignoré) ou "disconnect" (client fermé)
+    ws_slow_consumer_policy: str = "disconnect"
+
     class Config:
         env_file = ".env"
 
@@ -1,10 +1,13 @@
 from fastapi import FastAPI, Request
-from app.routers import auth, profile, log, profiles_complete, chat, match, notifications, setting
+from app.routers import auth, profile, log, profiles_complete, chat, match, notifications, setting, metrics, realtime
 from app.config import settings
 from app.utils.database import create_tables
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.utils.scheduler import start_scheduler
+from app.profile.tag_service import migrate_interests_to_tag_ids
+from app.profile.fame_buffer import fame_buffer
+from app.utils.pubsub import pubsub
 import sys
 import os
 
@@ -19,6 +22,15 @@ start_scheduler()
 @app.on_event("startup")
 async def startup_event():
     await create_tables()
+    await migrate_interests_to_tag_ids()
+    fame_buffer.start()
+    await pubsub.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Écrire les incréments de fame rating encore en attente
+    await fame_buffer.stop()
+    await pubsub.stop()
 
 app.add_middleware(SessionMiddleware, secret_key=settings.api_secret)
 
@@ -41,3 +53,5 @@ app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(match.router, prefix="/match", tags=["match"])
 app.include_router(setting.router, prefix="/setting", tags=["setting"])
 app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(realtime.router, prefix="/realtime", tags=["realtime"])
@@ -0,0 +1,37 @@
+from app.match.feed_cache import feed_cache
+from app.match.relationship_service import relationship_cache
+from app.utils.pubsub import pubsub, WORKER_ID
+
+def apply_invalidation(relationships: list[int] | None, feeds: list[int] | None) -> None:
+    """Invalide les caches de ce worker (paires user_id <-> autres, puis fils de découverte)."""
+    if relationships:
+        relationship_cache.invalidate(*relationships)
+    if feeds:
+        feed_cache.invalidate(*feeds)
+
+async def invalidate_caches(relationships: list[int] | None = None, feeds: list[int] | None = None) -> None:
+    """
+    À appeler après toute écriture (une fois la transaction validée) qui change
+    l'état d'une paire ou le fil d'un utilisateur.
+    `relationships` : [user_id, *other_ids], les paires entre user_id et chacun des autres.
+    `feeds` : les utilisateurs dont le fil en cache doit être recalculé.
+    Les caches sont tenus par process : l'invalidation est appliquée ici tout de suite,
+    puis publiée sur le pub/sub Postgres pour être appliquée par les autres workers.
+    """
+    apply_invalidation(relationships, feeds)
+    try:
+        await pubsub.publish("cache_invalidation", {
+            "origin": WORKER_ID,
+            "relationships": relationships,
+            "feeds": feeds,
+        })
+    except Exception as e:
+        # L'écriture est validée : les autres workers retomberont sur la durée de vie des entrées
+        print(f"⚠️ Erreur lors de la diffusion de l'invalidation des caches : {e}")
+
+async def on_cache_invalidation(data: dict) -> None:
+    """Applique une invalidation publiée par un autre worker."""
+    if data.get("origin") != WORKER_ID:
+        apply_invalidation(data.get("relationships"), data.get("feeds"))
+
+pubsub.subscribe("cache_invalidation", on_cache_invalidation)
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+import time
+
+FEED_CACHE_TTL_SECONDS = 120  # Durée de vie d'un classement en cache
+FEED_CACHE_MAX_USERS = 2000  # Nombre max d'utilisateurs en cache (éviction LRU au-delà)
+
+class FeedCache:
+    """
+    Cache en mémoire (par process) du fil de découverte de chaque utilisateur :
+    les candidats avec leurs scores (distance, tags communs, fame rating),
+    classés page par page par `paginate_profiles`.
+    Les entrées expirent après `ttl` secondes et les moins récemment utilisées
+    sont évincées au-delà de `max_entries`. Les écritures invalident les fils
+    concernés dans tous les workers via `cache_invalidation.invalidate_caches`.
+    """
+
+    def __init__(self, max_entries: int = FEED_CACHE_MAX_USERS, ttl: float = FEED_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> dict | None:
+        """Retourne le fil en cache de l'utilisateur, ou None (absent ou expiré)."""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, user_id: int, feed: dict) -> None:
+        """Stocke le fil classé d'un utilisateur."""
+        self._entries[user_id] = (time.monotonic() + self.ttl, feed)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *user_ids: int) -> None:
+        """Supprime le fil en cache des utilisateurs donnés."""
+        for user_id in user_ids:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Compteurs exposés pour dimensionner le cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+feed_cache = FeedCache()
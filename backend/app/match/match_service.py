@@ -1,194 +1,465 @@
 from sqlalchemy.sql import text
-from datetime import datetime
+from datetime import datetime, date, timezone
+from functools import lru_cache
 from app.utils.database import engine
-from app.profile.location_service import haversine
+from app.match.cache_invalidation import invalidate_caches
+from app.match.ranking_engine import sort_key, key_length, feature_fields
+from app.profile.fame_buffer import fame_buffer
+from app.profile.fame_decay import decayed_fame, decayed_fame_sql
+from app.profile.location_service import haversine_batch, bounding_box, bounding_box_filter
+import numpy as np
+import base64
+import heapq
 import json
+import math
 
-async def check_same_like(liker_id: int, liked_id: int):
-    """Vérifie si un like identique existe."""
+async def set_unlike_status(liker_id: int, liked_id: int) -> bool:
     async with engine.begin() as conn:
+        # Vérifier si la ligne existe déjà et si "unlike" est déjà True
         result = await conn.execute(
             text("""
-                SELECT 1 FROM likes
+                SELECT unlike FROM likes
                 WHERE liker_id = :liker_id AND liked_id = :liked_id
-                LIMIT 1;
             """),
             {"liker_id": liker_id, "liked_id": liked_id}
         )
-        return result.first()
+        row = result.first()
+        if not row:
+            return False  # Aucune ligne à modifier
+        if row.unlike:
+            return False  # Déjà à True, rien à faire
 
-async def insert_like(liker_id: int, liked_id: int):
-    """Insère un like si inexistant."""
-    async with engine.begin() as conn:
+        # Mettre à jour le champ unlike à TRUE
         await conn.execute(
             text("""
-                INSERT INTO likes (liker_id, liked_id, created_at)
-                VALUES (:liker_id, :liked_id, NOW())
-                ON CONFLICT DO NOTHING;
+                UPDATE likes
+                SET unlike = TRUE
+                WHERE liker_id = :liker_id AND liked_id = :liked_id
             """),
             {"liker_id": liker_id, "liked_id": liked_id}
         )
+    await invalidate_caches(relationships=[liker_id, liked_id], feeds=[liker_id])
+    return True
 
-async def check_match(liker_id: int, liked_id: int):
-    """Vérifie s'il y a un match (like inverse)."""
-    async with engine.begin() as conn:
-        result = await conn.execute(
-            text("""
+LIKE_FAME_POINTS = 3  # Pour le profil liké
+MATCH_FAME_POINTS = 7  # Pour chacun des deux profils en cas de match
+
+LIKE_QUERY = text("""
+    WITH target AS (
+        SELECT id, username FROM users WHERE id = :liked_id
+    ),
+    state AS (
+        SELECT
+            target.id AS target_id,
+            target.username AS target_username,
+            TRUE AS found,
+            EXISTS (
+                SELECT 1 FROM blocks
+                WHERE (blocker_id = :liker_id AND blocked_id = :liked_id)
+                   OR (blocker_id = :liked_id AND blocked_id = :liker_id)
+            ) AS blocked,
+            EXISTS (
                 SELECT 1 FROM likes
-                WHERE liker_id = :liked_id AND liked_id = :liker_id
-                LIMIT 1;
-            """),
-            {"liked_id": liked_id, "liker_id": liker_id}
+                WHERE ((liker_id = :liker_id AND liked_id = :liked_id)
+                    OR (liker_id = :liked_id AND liked_id = :liker_id))
+                  AND unlike
+            ) AS unliked,
+            EXISTS (
+                SELECT 1 FROM profile_pictures
+                WHERE user_id = :liker_id AND is_profile_picture = TRUE
+            ) AS has_picture,
+            EXISTS (
+                SELECT 1 FROM likes WHERE liker_id = :liker_id AND liked_id = :liked_id
+            ) AS already_liked,
+            EXISTS (
+                SELECT 1 FROM likes WHERE liker_id = :liked_id AND liked_id = :liker_id
+            ) AS liked_back
+        FROM target
+    ),
+    inserted AS (
+        INSERT INTO likes (liker_id, liked_id, created_at)
+        SELECT :liker_id, :liked_id, NOW() FROM state
+        WHERE NOT blocked AND NOT unliked AND has_picture AND NOT already_liked
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    ),
+    conversation AS (
+        INSERT INTO conversations (user1_id, user2_id, created_at)
+        SELECT :liker_id, :liked_id, NOW() FROM state, inserted
+        WHERE state.liked_back AND NOT EXISTS (
+            SELECT 1 FROM conversations
+            WHERE (user1_id = :liker_id AND user2_id = :liked_id)
+               OR (user1_id = :liked_id AND user2_id = :liker_id)
         )
-        return result.first()
+        RETURNING id
+    )
+    SELECT state.*,
+           EXISTS (SELECT 1 FROM inserted) AS inserted,
+           (SELECT id FROM conversation) AS conversation_id
+    FROM (SELECT 1) AS one
+    LEFT JOIN state ON TRUE;
+""")
+
+def add_like_fame(liker_id: int, liked_id: int, matched: bool):
+    """Points de fame d'un like (et d'un match) ajoutés au tampon d'écriture groupée."""
+    fame_buffer.add(liked_id, LIKE_FAME_POINTS)
+    if matched:
+        fame_buffer.add(liker_id, MATCH_FAME_POINTS)
+        fame_buffer.add(liked_id, MATCH_FAME_POINTS)
+
+def like_status(row) -> str:
+    """Statut d'un like d'après l'état de la paire renvoyé par LIKE_QUERY ou LIKE_MANY_QUERY."""
+    if row["target_id"] is None or not row["found"]:
+        return "not_found"
+    if row["blocked"]:
+        return "blocked"
+    if row["unliked"]:
+        return "unliked"
+    if not row["has_picture"]:
+        return "no_picture"
+    if row["already_liked"] or not row["inserted"]:
+        return "already_liked"
+    return "matched" if row["liked_back"] else "liked"
+
+async def like(liker_id: int, liked_id: int) -> dict:
+    """
+    Like complet en une transaction : vérifications (blocage, unlike, photo, doublon),
+    insertion du like, détection du match et création de la conversation.
+    Les points de fame rating passent par `fame_buffer`.
+    Retourne {"status", "conversation_id", "target_username"} avec status parmi :
+    self, not_found, blocked, unliked, no_picture, already_liked, liked, matched.
+    Les notifications sont envoyées par le routeur selon ce résultat.
+    """
+    result = {"status": "self", "conversation_id": None, "target_username": None}
+    if liker_id == liked_id:
+        return result
 
-async def mutual_like_by_match(user_a_id: int, user_b_id: int) -> bool:
-    """Retourne True si user A et user B se sont likés mutuellement (match)."""
     async with engine.begin() as conn:
-        result = await conn.execute(
-            text("""
-                SELECT
-                    (SELECT 1 FROM likes WHERE liker_id = :a AND liked_id = :b AND unlike IS NOT TRUE LIMIT 1) AS a_likes_b,
-                    (SELECT 1 FROM likes WHERE liker_id = :b AND liked_id = :a AND unlike IS NOT TRUE LIMIT 1) AS b_likes_a
-            """),
-            {"a": user_a_id, "b": user_b_id}
+        # Verrou sur la paire : deux likes croisés simultanés détectent bien le match
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(LEAST(CAST(:a AS INTEGER), :b), GREATEST(CAST(:a AS INTEGER), :b));"),
+            {"a": liker_id, "b": liked_id}
         )
-        row = result.first()
-        return bool(row and row.a_likes_b and row.b_likes_a)
+        row = (await conn.execute(LIKE_QUERY, {
+            "liker_id": liker_id,
+            "liked_id": liked_id,
+        })).mappings().first()
 
-async def check_if_unliked(liker_id: int, liked_id: int) -> bool:
-    query = text("""
-        SELECT unlike
-        FROM likes
-        WHERE liker_id = :liker_id AND liked_id = :liked_id
-        LIMIT 1
-    """)
-    
-    async with engine.begin() as conn:
-        result = await conn.execute(query, {"liker_id": liker_id, "liked_id": liked_id})
-        row = result.fetchone()
-        if row:
-            return row.unlike
-        return False  # Aucun like trouvé = pas unliked
+    result["target_username"] = row["target_username"]
+    result["status"] = like_status(row)
+    if result["status"] == "matched":
+        result["conversation_id"] = row["conversation_id"]
 
-async def set_unlike_status(liker_id: int, liked_id: int) -> bool:
-    async with engine.begin() as conn:
-        # Vérifier si la ligne existe déjà et si "unlike" est déjà True
-        result = await conn.execute(
-            text("""
-                SELECT unlike FROM likes
-                WHERE liker_id = :liker_id AND liked_id = :liked_id
-            """),
-            {"liker_id": liker_id, "liked_id": liked_id}
+    if row["inserted"]:
+        add_like_fame(liker_id, liked_id, matched=result["status"] == "matched")
+        await invalidate_caches(relationships=[liker_id, liked_id], feeds=[liker_id])
+    return result
+
+MAX_LIKE_BATCH_SIZE = 100
+
+LIKE_MANY_QUERY = text("""
+    WITH liker AS (
+        SELECT EXISTS (
+            SELECT 1 FROM profile_pictures
+            WHERE user_id = :liker_id AND is_profile_picture = TRUE
+        ) AS has_picture
+    ),
+    targets AS (
+        SELECT DISTINCT target_id
+        FROM unnest(CAST(:target_ids AS INTEGER[])) AS target_id
+        WHERE target_id <> :liker_id
+    ),
+    state AS (
+        SELECT
+            targets.target_id,
+            users.username AS target_username,
+            users.id IS NOT NULL AS found,
+            EXISTS (
+                SELECT 1 FROM blocks
+                WHERE (blocker_id = :liker_id AND blocked_id = targets.target_id)
+                   OR (blocker_id = targets.target_id AND blocked_id = :liker_id)
+            ) AS blocked,
+            EXISTS (
+                SELECT 1 FROM likes
+                WHERE ((liker_id = :liker_id AND liked_id = targets.target_id)
+                    OR (liker_id = targets.target_id AND liked_id = :liker_id))
+                  AND unlike
+            ) AS unliked,
+            EXISTS (
+                SELECT 1 FROM likes WHERE liker_id = :liker_id AND liked_id = targets.target_id
+            ) AS already_liked,
+            EXISTS (
+                SELECT 1 FROM likes WHERE liker_id = targets.target_id AND liked_id = :liker_id
+            ) AS liked_back
+        FROM targets
+        LEFT JOIN users ON users.id = targets.target_id
+    ),
+    inserted AS (
+        INSERT INTO likes (liker_id, liked_id, created_at)
+        SELECT :liker_id, state.target_id, NOW() FROM state, liker
+        WHERE state.found AND NOT state.blocked AND NOT state.unliked
+          AND liker.has_picture AND NOT state.already_liked
+        ON CONFLICT DO NOTHING
+        RETURNING liked_id
+    ),
+    matched AS (
+        SELECT state.target_id
+        FROM state
+        JOIN inserted ON inserted.liked_id = state.target_id
+        WHERE state.liked_back
+    ),
+    conversation AS (
+        INSERT INTO conversations (user1_id, user2_id, created_at)
+        SELECT :liker_id, matched.target_id, NOW() FROM matched
+        WHERE NOT EXISTS (
+            SELECT 1 FROM conversations
+            WHERE (user1_id = :liker_id AND user2_id = matched.target_id)
+               OR (user1_id = matched.target_id AND user2_id = :liker_id)
         )
-        row = result.first()
-        if not row:
-            return False  # Aucune ligne à modifier
-        if row.unlike:
-            return False  # Déjà à True, rien à faire
+        RETURNING id, user2_id AS target_id
+    )
+    SELECT state.*, liker.has_picture,
+           inserted.liked_id IS NOT NULL AS inserted,
+           conversation.id AS conversation_id
+    FROM state
+    CROSS JOIN liker
+    LEFT JOIN inserted ON inserted.liked_id = state.target_id
+    LEFT JOIN conversation ON conversation.target_id = state.target_id;
+""")
 
-        # Mettre à jour le champ unlike à TRUE
+async def like_many(liker_id: int, target_ids: list[int]) -> dict[int, dict]:
+    """
+    Version groupée de `like` (sessions de swipe) : une seule transaction pour tous les
+    profils ciblés (validation, insertion multi-lignes, matchs, conversations).
+    Retourne {target_id: {"status", "conversation_id", "target_username"}}.
+    """
+    results = {
+        target_id: {"status": "self", "conversation_id": None, "target_username": None}
+        for target_id in target_ids
+    }
+    others = sorted({target_id for target_id in target_ids if target_id != liker_id})
+    if not others:
+        return results
+
+    async with engine.begin() as conn:
+        # Verrous des paires pris dans un ordre stable (pas d'interblocage entre deux lots)
         await conn.execute(
             text("""
-                UPDATE likes
-                SET unlike = TRUE
-                WHERE liker_id = :liker_id AND liked_id = :liked_id
+                SELECT pg_advisory_xact_lock(LEAST(CAST(:liker_id AS INTEGER), target_id), GREATEST(CAST(:liker_id AS INTEGER), target_id))
+                FROM unnest(CAST(:target_ids AS INTEGER[])) AS target_id
+                ORDER BY LEAST(CAST(:liker_id AS INTEGER), target_id), GREATEST(CAST(:liker_id AS INTEGER), target_id);
             """),
-            {"liker_id": liker_id, "liked_id": liked_id}
+            {"liker_id": liker_id, "target_ids": others}
         )
-        return True
+        rows = (await conn.execute(LIKE_MANY_QUERY, {
+            "liker_id": liker_id,
+            "target_ids": others,
+        })).mappings().all()
+
+    for row in rows:
+        status = like_status(row)
+        if row["inserted"]:
+            add_like_fame(liker_id, row["target_id"], matched=status == "matched")
+        results[row["target_id"]] = {
+            "status": status,
+            "conversation_id": row["conversation_id"] if status == "matched" else None,
+            "target_username": row["target_username"],
+        }
+
+    inserted_ids = [row["target_id"] for row in rows if row["inserted"]]
+    if inserted_ids:
+        await invalidate_caches(relationships=[liker_id, *inserted_ids], feeds=[liker_id])
+    return results
 
-async def get_liked_user_ids(conn, user_id):
-    """Récupère les utilisateurs déjà likés par l'utilisateur."""
+async def get_discovery_context(user_id: int) -> dict | None:
+    """
+    Récupère en un seul aller-retour le contexte de découverte d'un utilisateur :
+    localisation, affichage de la carte, genre, préférences, âge et profils likés.
+    Retourne None si le profil ou la localisation est absent.
+    """
     query = text("""
-        SELECT liked_id
-        FROM likes
-        WHERE liker_id = :user_id;
+        SELECT locations.latitude, locations.longitude, locations.map_enabled,
+               profiles.gender, profiles.sexual_preferences, profiles.birthday,
+               ARRAY(SELECT liked_id FROM likes WHERE liker_id = :user_id) AS liked_ids
+        FROM profiles
+        JOIN locations ON locations.user_id = profiles.user_id
+        WHERE profiles.user_id = :user_id
+        LIMIT 1;
     """)
-    result = await conn.execute(query, {"user_id": user_id})
-    return {row[0] for row in result.fetchall()}
+    async with engine.begin() as conn:
+        result = await conn.execute(query, {"user_id": user_id})
+        row = result.mappings().first()
 
-async def get_matching_profiles(conn, user_id, gender, preferences):
-    """Récupère les profils selon les préférences sexuelles."""
-    orientation_filter = get_orientation_filter(gender, preferences)
-    query = text(f"""
-        SELECT users.id, users.username, profiles.gender, profiles.sexual_preferences,
-               profiles.birthday, profiles.interests, profiles.fame_rating, 
-               locations.latitude, locations.longitude
-        FROM users
-        JOIN profiles ON users.id = profiles.user_id
-        JOIN locations ON users.id = locations.user_id
-        WHERE users.id != :user_id
-          AND {orientation_filter};
-    """)
-    result = await conn.execute(query, {"user_id": user_id})
+    if not row:
+        return None
+    return {
+        **row,
+        "liked_ids": set(row["liked_ids"]),
+        "age": calculate_age(row["birthday"]) if row["birthday"] else None,
+    }
+
+async def fetch_matching_profiles(user_id, gender, preferences, **kwargs):
+    """`get_matching_profiles` sur sa propre connexion du pool (utilisable avec asyncio.gather)."""
+    async with engine.begin() as conn:
+        return await get_matching_profiles(conn, user_id, gender, preferences, **kwargs)
+
+async def get_matching_profiles(conn, user_id, gender, preferences, filters=None):
+    """
+    Récupère les profils selon les préférences sexuelles.
+    `filters` est un couple (clause SQL, paramètres) produit par `build_profile_filters`
+    (âge, célébrité et rectangle englobant de la distance max, via la grille spatiale) ;
+    la distance exacte est ensuite calculée par `enrich_profiles`.
+    """
+    orientation_filter, orientation_params = get_orientation_filter(gender, preferences)
+    params = {"user_id": user_id, **orientation_params}
+
+    extra_filter = "TRUE"
+    if filters is not None:
+        extra_filter, filter_params = filters
+        params.update(filter_params)
+
+    query = _candidate_query(orientation_filter, extra_filter)
+    result = await conn.execute(query, params)
     return result.mappings().all()
 
-def get_orientation_filter(user_gender: str, user_pref: str) -> str:
+def _years_before(day: date, years: int) -> date:
+    """Retourne la date `years` ans avant `day` (le 29 février devient le 28)."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+def build_profile_filters(min_age=None, max_age=None, min_fame=None, max_fame=None,
+                          center=None, max_distance_km=None, fame_at=None) -> tuple[str, dict]:
     """
-    Retourne une clause SQL pour filtrer les profils en fonction
-    du genre et des préférences sexuelles du user.
+    Construit les prédicats SQL de recherche :
+    - âge min/max -> intervalle sur profiles.birthday
+    - célébrité min/max -> bornes sur le fame rating à la date `fame_at` (maintenant par défaut)
+    - distance max -> rectangle englobant sur locations (grille spatiale)
+    Retourne (clause SQL, paramètres) à passer à `get_matching_profiles`.
     """
+    today = date.today()
+    clauses = []
+    params = {}
+    fame_sql = decayed_fame_sql()
+    if fame_at is not None:
+        fame_sql = decayed_fame_sql(at="CAST(:fame_at AS TIMESTAMPTZ)")
+        params["fame_at"] = fame_at
+
+    if min_age is not None:
+        # âge >= min_age  <=>  né au plus tard il y a min_age ans
+        clauses.append("profiles.birthday <= :max_birthday")
+        params["max_birthday"] = _years_before(today, min_age)
+    if max_age is not None:
+        # âge <= max_age  <=>  né strictement après il y a (max_age + 1) ans
+        clauses.append("profiles.birthday > :min_birthday")
+        params["min_birthday"] = _years_before(today, max_age + 1)
+    if min_fame is not None:
+        # La valeur stockée majore la valeur courante : condition nécessaire qui utilise l'index
+        clauses.append(f"profiles.fame_rating >= :min_fame AND {fame_sql} >= :min_fame")
+        params["min_fame"] = min_fame
+    if max_fame is not None:
+        clauses.append(f"{fame_sql} <= :max_fame")
+        params["max_fame"] = max_fame
+    if max_distance_km is not None and center is not None:
+        bbox_clause, bbox_params = bounding_box_filter(bounding_box(center[0], center[1], max_distance_km))
+        clauses.append(bbox_clause)
+        params.update(bbox_params)
+
+    return (" AND ".join(clauses) or "TRUE"), params
+
+# Clauses d'orientation paramétrées : le texte SQL ne dépend que de la préférence,
+# les genres sont passés en paramètres, ce qui permet de réutiliser les requêtes préparées.
+ORIENTATION_CLAUSES = {
+    # Cherche uniquement le sexe opposé, qui soit hétéro ou bi
+    "heterosexual": (
+        "profiles.gender = :opposite_gender "
+        "AND profiles.sexual_preferences IN ('heterosexual', 'bisexual')"
+    ),
+    # Cherche le même genre, qui soit homo ou bi
+    "homosexual": (
+        "profiles.gender = :same_gender "
+        "AND profiles.sexual_preferences IN ('homosexual', 'bisexual')"
+    ),
+    # Cherche :
+    # - le même genre avec orientation bi ou homo
+    # - le sexe opposé avec orientation bi ou hétéro
+    "bisexual": (
+        "((profiles.gender = :same_gender AND profiles.sexual_preferences IN ('homosexual', 'bisexual')) "
+        "OR (profiles.gender = :opposite_gender AND profiles.sexual_preferences IN ('heterosexual', 'bisexual')))"
+    ),
+}
+
+def get_orientation_filter(user_gender: str, user_pref: str) -> tuple[str, dict]:
+    """
+    Retourne (clause SQL paramétrée, paramètres) pour filtrer les profils
+    en fonction du genre et des préférences sexuelles du user.
+    Comme avant le passage aux paramètres liés, un genre autre que male/female
+    (ou absent) retombe sur "male" comme sexe opposé en hétéro, "female" en bi.
+    """
+    clause = ORIENTATION_CLAUSES.get(user_pref)
+    if clause is None:
+        # Par défaut (au cas où), ne filtre rien
+        return "TRUE", {}
     if user_pref == "heterosexual":
-        # Cherche uniquement le sexe opposé, qui soit hétéro ou bi
-        target_gender = "female" if user_gender == "male" else "male"
-        return f"profiles.gender = '{target_gender}' AND profiles.sexual_preferences IN ('heterosexual', 'bisexual')"
-
-    elif user_pref == "homosexual":
-        # Cherche le même genre, qui soit homo ou bi
-        return f"profiles.gender = '{user_gender}' AND profiles.sexual_preferences IN ('homosexual', 'bisexual')"
-
-    elif user_pref == "bisexual":
-        # Cherche :
-        # - le même genre avec orientation bi ou homo
-        # - le sexe opposé avec orientation bi ou hétéro
-        same_gender = user_gender
+        opposite_gender = "female" if user_gender == "male" else "male"
+    else:
         opposite_gender = "male" if user_gender == "female" else "female"
-        return (
-            f"((profiles.gender = '{same_gender}' AND profiles.sexual_preferences IN ('homosexual', 'bisexual')) "
-            f"OR (profiles.gender = '{opposite_gender}' AND profiles.sexual_preferences IN ('heterosexual', 'bisexual')))"
-        )
+    return clause, {"same_gender": user_gender, "opposite_gender": opposite_gender}
 
-    # Par défaut (au cas où), ne filtre rien
-    return "TRUE"
+@lru_cache(maxsize=64)
+def _candidate_query(orientation_filter: str, extra_filter: str):
+    """
+    Construit (une seule fois par forme de requête) la requête des candidats.
+    Toutes les valeurs sont des paramètres liés : le texte SQL est identique
+    d'un utilisateur à l'autre et asyncpg réutilise la requête préparée.
+    """
+    return text(f"""
+        SELECT users.id, users.username, profiles.gender, profiles.sexual_preferences,
+               profiles.birthday, profiles.fame_rating, profiles.fame_updated_at,
+               locations.latitude, locations.longitude,
+               (
+                   SELECT COUNT(*) FROM unnest(profiles.tag_ids) AS t(id)
+                   WHERE t.id = ANY(COALESCE(
+                       (SELECT me.tag_ids FROM profiles me WHERE me.user_id = :user_id), CAST(ARRAY[] AS INTEGER[])
+                   ))
+               ) AS common_tags
+        FROM users
+        JOIN profiles ON users.id = profiles.user_id
+        JOIN locations ON users.id = locations.user_id
+        WHERE users.id != :user_id
+          AND {orientation_filter}
+          AND {extra_filter};
+    """)
 
 def calculate_age(birthday):
     """Calcule l'âge à partir de la date de naissance."""
     today = datetime.today()
     return today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
 
-def count_common_tags(user_tags: str, profile_tags: str) -> int:
-    """Compte le nombre de tags communs entre deux chaînes JSON représentant des listes."""
-    try:
-        user_list = json.loads(user_tags) if user_tags else []
-    except json.JSONDecodeError:
-        user_list = []
-
-    try:
-        profile_list = json.loads(profile_tags) if profile_tags else []
-    except json.JSONDecodeError:
-        profile_list = []
-
-    user_set = set(tag.strip().lower() for tag in user_list)
-    profile_set = set(tag.strip().lower() for tag in profile_list)
-
-    return len(user_set & profile_set)
+async def enrich_profiles(user_lat, user_lon, liked_user_ids, profiles, include_coords=False, fame_at=None):
+    """
+    Ajoute distance, âge et nombre de tags communs à chaque profil, ainsi que
+    le fame rating à la date `fame_at` (maintenant par défaut).
+    """
+    # Distances calculées en une seule passe vectorisée (None -> NaN)
+    latitudes = np.array(
+        [p["latitude"] if p["latitude"] is not None else np.nan for p in profiles], dtype=np.float64
+    )
+    longitudes = np.array(
+        [p["longitude"] if p["longitude"] is not None else np.nan for p in profiles], dtype=np.float64
+    )
+    distances = np.rint(haversine_batch(user_lat, user_lon, latitudes, longitudes))
+    fame_at = fame_at or datetime.now(timezone.utc)
 
-async def enrich_profiles(user_lat, user_lon, user_interests, liked_user_ids, profiles, include_coords=False):
-    """Ajoute distance, âge et nombre de tags communs à chaque profil."""
+    extra_fields = feature_fields()
     profiles_with_details = []
-    for profile in profiles:
-        distance_km = None
-        if profile["latitude"] is not None and profile["longitude"] is not None:
-            distance_km = round(
-                haversine(user_lat, user_lon, profile["latitude"], profile["longitude"])
-            )
+    for profile, distance in zip(profiles, distances.tolist()):
+        distance_km = None if math.isnan(distance) else int(distance)
 
         age = calculate_age(profile["birthday"]) if profile["birthday"] else None
-        print("user_interests:", user_interests, type(user_interests))
-        print("profile_interests:", profile["interests"], type(profile["interests"]))
-        common_tags = count_common_tags(user_interests, profile["interests"])
-        fame_rating = profile.get("fame_rating", 0)  # Si non défini, valeur par défaut 0
+        # Fame rating : valeur stockée diminuée depuis sa dernière mise à jour jusqu'à `fame_at`
+        fame_rating = decayed_fame(profile.get("fame_rating", 0), profile.get("fame_updated_at"), fame_at)
 
         enriched = {
             "id": profile["id"],
@@ -196,10 +467,15 @@ async def enrich_profiles(user_lat, user_lon, user_interests, liked_user_ids, pr
             "distance_km": distance_km,
             "liked": profile["id"] in liked_user_ids,
             "age": age,
-            "common_tags": common_tags,
+            "common_tags": profile["common_tags"],  # Calculé en SQL sur les ids normalisés
             "fame_rating": fame_rating  # Ajout du fame_rating pour le tri
         }
 
+        # Colonnes brutes lues par les caractéristiques de `ranking_engine` enregistrées
+        for field in extra_fields:
+            if field not in enriched and field in profile:
+                enriched[field] = profile[field]
+
         if include_coords:
             enriched["latitude"] = profile["latitude"]
             enriched["longitude"] = profile["longitude"]
@@ -208,11 +484,76 @@ async def enrich_profiles(user_lat, user_lon, user_interests, liked_user_ids, pr
 
     return profiles_with_details
 
-async def sort_profiles(profiles: list[dict]) -> list[dict]:
+async def sort_profiles(profiles: list[dict], limit: int | None = None, after: tuple | None = None) -> list[dict]:
+    """
+    Trie les profils selon la stratégie de `ranking_engine` (par défaut : distance
+    croissante, puis tags communs et fame rating décroissants).
+    Avec `limit`, seuls les `limit` premiers sont sélectionnés (tas borné, O(n log k))
+    au lieu d'un tri complet. Avec `after`, seuls les profils classés strictement
+    après cette clé sont considérés.
     """
-    Trie les profils par :
-    1. Distance (croissante)
-    2. Nombre de tags communs (décroissant)
-    3. Fame rating (décroissant)
+    if after is not None:
+        profiles = [p for p in profiles if sort_key(p) > after]
+    if limit is not None:
+        return heapq.nsmallest(limit, profiles, key=sort_key)
+    return sorted(profiles, key=sort_key)
+
+def encode_cursor(profile: dict, fame_at: datetime) -> str:
     """
-    return sorted(profiles, key=lambda p: (p["distance_km"], -p["common_tags"], -p["fame_rating"]))
\ No newline at end of file
+    Encode la clé de tri d'un profil en curseur opaque (base64 urlsafe), avec la date
+    à laquelle les fame ratings de la session de pagination sont calculés.
+    """
+    payload = json.dumps({"key": list(sort_key(profile)), "fame_at": int(fame_at.timestamp())})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[tuple, datetime]:
+    """
+    Décode un curseur opaque en (clé de tri, date de calcul des fame ratings).
+    Lève ValueError si le curseur est invalide.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid cursor")
+    key, fame_at = payload.get("key"), payload.get("fame_at")
+    if not isinstance(key, list) or len(key) != key_length() or not all(isinstance(v, (int, float)) for v in key):
+        raise ValueError("Invalid cursor")
+    if not isinstance(fame_at, int):
+        raise ValueError("Invalid cursor")
+    try:
+        return tuple(key), datetime.fromtimestamp(fame_at, timezone.utc)
+    except (ValueError, OverflowError, OSError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+def pagination_fame_at(cursor: str | None = None) -> datetime:
+    """
+    Date de calcul des fame ratings d'une session de pagination : celle du curseur,
+    sinon maintenant (à la seconde). Le fame rating décroît avec le temps : le figer
+    pour toute la session garde les clés de tri stables d'une page à l'autre.
+    Lève ValueError si le curseur est invalide.
+    """
+    if cursor:
+        return decode_cursor(cursor)[1]
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+async def paginate_profiles(profiles: list[dict], fame_at: datetime, cursor: str | None = None,
+                            page_size: int | None = None):
+    """
+    Pagination par clé (keyset) : classe uniquement la page demandée (top-K)
+    parmi les profils situés après le curseur.
+    `fame_at` est la date à laquelle le fame rating des profils a été calculé
+    (voir `pagination_fame_at`) ; elle est reportée dans le curseur suivant.
+    Retourne (page, next_cursor) ; next_cursor vaut None s'il n'y a plus de résultats.
+    """
+    after = decode_cursor(cursor)[0] if cursor else None
+
+    if page_size is None:
+        return await sort_profiles(profiles, after=after), None
+
+    # Un profil de plus que la page pour savoir s'il reste des résultats
+    ranked = await sort_profiles(profiles, limit=page_size + 1, after=after)
+    page = ranked[:page_size]
+    next_cursor = encode_cursor(page[-1], fame_at) if len(ranked) > page_size else None
+    return page, next_cursor
@@ -0,0 +1,119 @@
+import numpy as np
+from app.config import settings
+from app.profile.fame_decay import MAX_FAME_RATING
+
+# Échelles de normalisation des caractéristiques (score dans [0, 1], plus haut = mieux)
+DISTANCE_SCALE_KM = 50  # À 50 km, le score de distance vaut 0.5
+MAX_COMMON_TAGS = 5  # Au-delà, le score de tags est saturé
+AGE_GAP_SCALE_YEARS = 5  # À 5 ans d'écart, le score d'âge vaut 0.5
+
+DEFAULT_WEIGHTS = {
+    "distance": 0.4,
+    "common_tags": 0.3,
+    "fame_rating": 0.2,
+    "age_gap": 0.1,
+}
+
+# Registre des caractéristiques : nom -> (fonction(columns, context) -> np.ndarray, champs lus)
+FEATURES = {}
+
+def register_feature(name: str, fields: tuple[str, ...]):
+    """
+    Décorateur pour ajouter une caractéristique au score pondéré.
+    `fields` liste les champs des profils enrichis dont elle a besoin ; une colonne
+    absente du profil enrichi est recopiée depuis la requête des candidats par
+    `enrich_profiles`. La fonction reçoit ces colonnes NumPy (voir `build_columns`)
+    et le contexte de l'utilisateur, et retourne un tableau de scores dans [0, 1].
+    """
+    def decorator(func):
+        FEATURES[name] = (func, tuple(fields))
+        return func
+    return decorator
+
+def build_columns(profiles: list[dict], fields) -> dict[str, np.ndarray]:
+    """Extrait les champs demandés des profils enrichis en colonnes NumPy (None/absent -> NaN)."""
+    return {
+        field: np.array(
+            [p.get(field) if p.get(field) is not None else np.nan for p in profiles], dtype=np.float64
+        )
+        for field in fields
+    }
+
+def feature_fields() -> set[str]:
+    """Champs lus par l'ensemble des caractéristiques enregistrées."""
+    return {field for _, fields in FEATURES.values() for field in fields}
+
+@register_feature("distance", fields=("distance_km",))
+def distance_feature(columns, context):
+    distance = columns["distance_km"]
+    return np.where(np.isnan(distance), 0.0, 1.0 / (1.0 + distance / DISTANCE_SCALE_KM))
+
+@register_feature("common_tags", fields=("common_tags",))
+def common_tags_feature(columns, context):
+    return np.clip(np.nan_to_num(columns["common_tags"]) / MAX_COMMON_TAGS, 0.0, 1.0)
+
+@register_feature("fame_rating", fields=("fame_rating",))
+def fame_rating_feature(columns, context):
+    return np.clip(np.nan_to_num(columns["fame_rating"]) / MAX_FAME_RATING, 0.0, 1.0)
+
+@register_feature("age_gap", fields=("age",))
+def age_gap_feature(columns, context):
+    user_age = context.get("age")
+    if user_age is None:
+        return np.zeros(len(columns["age"]))
+    gap = np.abs(columns["age"] - user_age)
+    return np.where(np.isnan(gap), 0.0, 1.0 / (1.0 + gap / AGE_GAP_SCALE_YEARS))
+
+def get_weights() -> dict[str, float]:
+    """Poids configurés (RANKING_WEIGHTS), complétés par les poids par défaut."""
+    return {**DEFAULT_WEIGHTS, **settings.ranking_weights}
+
+def score_profiles(profiles: list[dict], context: dict, weights: dict[str, float] | None = None) -> np.ndarray:
+    """Calcule le score pondéré de tous les candidats en une passe vectorisée."""
+    weights = weights if weights is not None else get_weights()
+    active = [(FEATURES[name], weight) for name, weight in weights.items() if weight and name in FEATURES]
+    # Seules les colonnes lues par les caractéristiques actives sont construites
+    fields = dict.fromkeys(field for (_, feature_fields), _ in active for field in feature_fields)
+    columns = build_columns(profiles, fields)
+    scores = np.zeros(len(profiles), dtype=np.float64)
+    for (feature, _), weight in active:
+        scores += weight * feature(columns, context)
+    return scores
+
+def lexicographic_key(profile: dict) -> tuple:
+    """
+    Clé de tri lexicographique : (distance, -tags communs, -fame rating, id).
+    Les profils sans distance sont placés en dernier ; l'id départage les égalités.
+    """
+    distance = profile["distance_km"] if profile["distance_km"] is not None else float("inf")
+    return (distance, -profile["common_tags"], -profile["fame_rating"], profile["id"])
+
+def weighted_key(profile: dict) -> tuple:
+    """Clé de tri par score pondéré décroissant (id pour départager)."""
+    return (-profile["score"], profile["id"])
+
+# Stratégies de classement : nom -> (clé de tri, longueur de la clé)
+# La plus petite clé est la mieux classée ; la longueur sert à valider les curseurs.
+STRATEGIES = {
+    "lexicographic": (lexicographic_key, 4),
+    "weighted": (weighted_key, 2),
+}
+
+def get_strategy() -> str:
+    """Stratégie configurée (RANKING_STRATEGY), lexicographique par défaut."""
+    return settings.ranking_strategy if settings.ranking_strategy in STRATEGIES else "lexicographic"
+
+def sort_key(profile: dict) -> tuple:
+    """Clé de tri totale d'un profil selon la stratégie configurée."""
+    return STRATEGIES[get_strategy()][0](profile)
+
+def key_length() -> int:
+    """Nombre d'éléments de la clé de tri de la stratégie configurée."""
+    return STRATEGIES[get_strategy()][1]
+
+def apply_scores(profiles: list[dict], context: dict) -> list[dict]:
+    """Ajoute le champ `score` aux profils si la stratégie pondérée est active."""
+    if get_strategy() == "weighted" and profiles:
+        for profile, score in zip(profiles, score_profiles(profiles, context).tolist()):
+            profile["score"] = round(score, 6)
+    return profiles
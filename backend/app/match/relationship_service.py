@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from sqlalchemy.sql import text
+from app.utils.database import engine
+import time
+
+RELATIONSHIP_CACHE_TTL_SECONDS = 300  # Filet de sécurité : les écritures invalident déjà le cache
+RELATIONSHIP_CACHE_MAX_PAIRS = 50_000  # Nombre max de paires orientées en cache (éviction LRU au-delà)
+
+# État orienté (user_id -> other_id) de plusieurs paires en une requête :
+# like et unlike dans les deux sens, blocage dans les deux sens.
+RELATIONSHIPS_QUERY = text("""
+    SELECT other.id AS other_id,
+           out_like.id IS NOT NULL AS likes,
+           COALESCE(out_like.unlike, FALSE) AS unliked,
+           in_like.id IS NOT NULL AS liked_by,
+           COALESCE(in_like.unlike, FALSE) AS unliked_by,
+           out_block.id IS NOT NULL AS blocks,
+           in_block.id IS NOT NULL AS blocked_by
+    FROM unnest(CAST(:other_ids AS INTEGER[])) AS other(id)
+    LEFT JOIN likes out_like ON out_like.liker_id = :user_id AND out_like.liked_id = other.id
+    LEFT JOIN likes in_like ON in_like.liker_id = other.id AND in_like.liked_id = :user_id
+    LEFT JOIN blocks out_block ON out_block.blocker_id = :user_id AND out_block.blocked_id = other.id
+    LEFT JOIN blocks in_block ON in_block.blocker_id = other.id AND in_block.blocked_id = :user_id;
+""")
+
+def build_state(likes: bool, unliked: bool, liked_by: bool, unliked_by: bool, blocks: bool, blocked_by: bool) -> dict:
+    """État d'une paire vue par un utilisateur, avec les états dérivés (blocked, match)."""
+    return {
+        "likes": likes,
+        "unliked": unliked,
+        "liked_by": liked_by,
+        "unliked_by": unliked_by,
+        "blocks": blocks,
+        "blocked_by": blocked_by,
+        "blocked": blocks or blocked_by,
+        "unliked_any": unliked or unliked_by,
+        "matched": likes and liked_by and not unliked and not unliked_by,
+    }
+
+def reverse_state(state: dict) -> dict:
+    """Même paire vue par l'autre utilisateur."""
+    return build_state(
+        likes=state["liked_by"], unliked=state["unliked_by"],
+        liked_by=state["likes"], unliked_by=state["unliked"],
+        blocks=state["blocked_by"], blocked_by=state["blocks"],
+    )
+
+class RelationshipCache:
+    """
+    Cache en mémoire (par process) de l'état des paires d'utilisateurs
+    (like, unlike, blocage, match), indexé par paire orientée (user_id, other_id).
+    Les écritures de likes et de blocages invalident les paires concernées dans
+    tous les workers (`cache_invalidation.invalidate_caches`) ; les lectures commencées avant une invalidation ne remplissent pas le cache.
+    """
+
+    def __init__(self, max_entries: int = RELATIONSHIP_CACHE_MAX_PAIRS, ttl: float = RELATIONSHIP_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[int, int], tuple[float, dict]] = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _get(self, key: tuple[int, int]) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _set(self, key: tuple[int, int], state: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_many(self, user_id: int, other_ids) -> dict[int, dict]:
+        """État de user_id envers chacun des other_ids (une requête pour les absents du cache)."""
+        states = {}
+        missing = []
+        for other_id in dict.fromkeys(other_ids):
+            state = self._get((user_id, other_id))
+            if state is None:
+                missing.append(other_id)
+            else:
+                states[other_id] = state
+        if not missing:
+            return states
+
+        generation = self._generation
+        async with engine.begin() as conn:
+            result = await conn.execute(RELATIONSHIPS_QUERY, {"user_id": user_id, "other_ids": missing})
+            rows = result.mappings().all()
+        self.queries += 1
+
+        for row in rows:
+            state = build_state(
+                row["likes"], row["unliked"], row["liked_by"],
+                row["unliked_by"], row["blocks"], row["blocked_by"],
+            )
+            states[row["other_id"]] = state
+            # Pas de mise en cache si une écriture a eu lieu pendant la requête
+            if generation == self._generation:
+                self._set((user_id, row["other_id"]), state)
+                self._set((row["other_id"], user_id), reverse_state(state))
+        return states
+
+    async def get(self, user_id: int, other_id: int) -> dict:
+        """État de user_id envers other_id."""
+        return (await self.get_many(user_id, [other_id]))[other_id]
+
+    def invalidate(self, user_id: int, *other_ids: int) -> None:
+        """Supprime du cache les paires (dans les deux sens) entre user_id et other_ids."""
+        self._generation += 1
+        for other_id in other_ids:
+            for key in ((user_id, other_id), (other_id, user_id)):
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Compteurs exposés pour dimensionner le cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "queries": self.queries,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+relationship_cache = RelationshipCache()
+
+async def get_relationship(user_id: int, other_id: int) -> dict:
+    """
+    État complet et orienté de la paire (user_id, other_id) :
+    likes, unliked, liked_by, unliked_by, blocks, blocked_by,
+    et les états dérivés blocked, unliked_any et matched.
+    """
+    return await relationship_cache.get(user_id, other_id)
@@ -17,6 +17,42 @@ async def insert_notification(receiver_id: int, sender_id: int, notification_typ
         })
         return result.fetchone()
 
+async def insert_notifications(notifications: list[dict]):
+    """
+    Insère plusieurs notifications en une requête (unnest), en ignorant celles dont
+    l'expéditeur est bloqué (dans un sens ou dans l'autre) ou a été unliké par le destinataire.
+    Chaque notification est un dict {receiver_id, sender_id, type, context}.
+    Retourne les lignes insérées (id, receiver_id, sender_id, type, context, timestamp).
+    """
+    if not notifications:
+        return []
+    query = text("""
+        INSERT INTO notifications (receiver_id, sender_id, type, context, timestamp, is_read)
+        SELECT n.receiver_id, n.sender_id, n.type, n.context, NOW(), FALSE
+        FROM unnest(
+            CAST(:receiver_ids AS INTEGER[]), CAST(:sender_ids AS INTEGER[]),
+            CAST(:types AS TEXT[]), CAST(:contexts AS TEXT[])
+        ) AS n(receiver_id, sender_id, type, context)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM blocks
+            WHERE (blocker_id = n.receiver_id AND blocked_id = n.sender_id)
+               OR (blocker_id = n.sender_id AND blocked_id = n.receiver_id)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM likes
+            WHERE liker_id = n.receiver_id AND liked_id = n.sender_id AND unlike
+        )
+        RETURNING id, receiver_id, sender_id, type, context, timestamp
+    """)
+    async with engine.begin() as conn:
+        result = await conn.execute(query, {
+            "receiver_ids": [n["receiver_id"] for n in notifications],
+            "sender_ids": [n["sender_id"] for n in notifications],
+            "types": [n["type"] for n in notifications],
+            "contexts": [n["context"] for n in notifications],
+        })
+        return result.fetchall()
+
 async def fetch_notifications(user_id: int, unread_only: bool = False):
     base_query = """
         SELECT n.id, n.type, n.context, n.sender_id, n.timestamp, u.username, n.is_read
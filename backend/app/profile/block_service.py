@@ -1,6 +1,8 @@
 from sqlalchemy.sql import text
 from app.utils.database import engine
 from app.tables.blocks import blocks_table
+from app.match.relationship_service import get_relationship
+from app.match.cache_invalidation import invalidate_caches
 
 async def block_user(blocker_id: int, blocked_id: int) -> None:
     """Bloque un utilisateur en l'insérant dans la table blocks, si non déjà présent."""
@@ -14,24 +16,29 @@ async def block_user(blocker_id: int, blocked_id: int) -> None:
             "blocker_id": blocker_id,
             "blocked_id": blocked_id,
         })
+    await invalidate_caches(relationships=[blocker_id, blocked_id], feeds=[blocker_id, blocked_id])
 
 async def is_user_blocked(blocker_id: int, blocked_id: int) -> bool:
     """Vérifie si blocker_id a bloqué blocked_id."""
-    async with engine.begin() as conn:
-        query = text("""
-            SELECT 1 FROM blocks
-            WHERE blocker_id = :blocker_id AND blocked_id = :blocked_id
-            LIMIT 1;
-        """)
-        result = await conn.execute(query, {
-            "blocker_id": blocker_id,
-            "blocked_id": blocked_id,
-        })
-        return result.first() is not None
+    return (await get_relationship(blocker_id, blocked_id))["blocks"]
 
 async def are_users_blocked(user1_id: int, user2_id: int) -> bool:
     """Vérifie si l'un des deux utilisateurs a bloqué l'autre."""
-    return await is_user_blocked(user1_id, user2_id) or await is_user_blocked(user2_id, user1_id)
+    return (await get_relationship(user1_id, user2_id))["blocked"]
+
+async def get_blocked_user_ids(user_id: int) -> set[int]:
+    """
+    Retourne en une seule requête les ids des utilisateurs bloqués par user_id
+    ou ayant bloqué user_id (dans les deux sens).
+    """
+    async with engine.begin() as conn:
+        query = text("""
+            SELECT blocked_id AS other_id FROM blocks WHERE blocker_id = :user_id
+            UNION
+            SELECT blocker_id AS other_id FROM blocks WHERE blocked_id = :user_id
+        """)
+        result = await conn.execute(query, {"user_id": user_id})
+        return {row.other_id for row in result.fetchall()}
 
 async def get_blocked_users(blocker_id: int) -> list[dict]:
     """Retourne les utilisateurs bloqués par l'utilisateur connecté, avec leur ID et nom."""
@@ -57,8 +64,4 @@ async def unblock_users(blocker_id: int, blocked_ids: list[int]) -> None:
             "blocker_id": blocker_id,
             "blocked_ids": blocked_ids,
         })
-
-async def async_generator_filter(iterable, async_predicate):
-    for item in iterable:
-        if await async_predicate(item):
-            yield item
\ No newline at end of file
+    await invalidate_caches(relationships=[blocker_id, *blocked_ids], feeds=[blocker_id, *blocked_ids])
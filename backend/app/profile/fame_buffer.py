@@ -0,0 +1,115 @@
+from sqlalchemy.sql import text
+from app.utils.database import engine
+from app.profile.fame_decay import decayed_fame_sql, MAX_FAME_RATING
+import asyncio
+import time
+
+FAME_FLUSH_INTERVAL_MS = 1000  # Écriture des deltas au plus tard toutes les N ms
+FAME_FLUSH_MAX_ENTRIES = 500  # Écriture anticipée dès M utilisateurs en attente
+
+# La valeur stockée est d'abord ramenée à sa valeur courante (décroissance), puis datée
+FLUSH_QUERY = text(f"""
+    UPDATE profiles
+    SET fame_rating = LEAST(:max_fame, {decayed_fame_sql()} + deltas.amount),
+        fame_updated_at = NOW()
+    FROM unnest(CAST(:user_ids AS INTEGER[]), CAST(:amounts AS INTEGER[])) AS deltas(user_id, amount)
+    WHERE profiles.user_id = deltas.user_id;
+""")
+
+class FameBuffer:
+    """
+    Tampon en mémoire (par process) des incréments de fame rating (write-behind).
+    Les deltas sont cumulés par utilisateur puis écrits en une seule requête
+    `UPDATE ... FROM unnest(...)` toutes les `interval_ms` ms, ou dès que
+    `max_entries` utilisateurs sont en attente. Le plafond de 50 est appliqué en SQL.
+    """
+
+    def __init__(self, interval_ms: int = FAME_FLUSH_INTERVAL_MS, max_entries: int = FAME_FLUSH_MAX_ENTRIES):
+        self.interval_ms = interval_ms
+        self.max_entries = max_entries
+        self._deltas: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._early_flush: asyncio.Task | None = None
+        self.buffered_increments = 0
+        self.buffered_points = 0
+        self.flushed_points = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    def add(self, user_id: int, amount: int = 1) -> None:
+        """Ajoute un delta de fame rating pour un utilisateur (sans accès à la base)."""
+        self._deltas[user_id] = self._deltas.get(user_id, 0) + amount
+        self.buffered_increments += 1
+        self.buffered_points += amount
+        if len(self._deltas) >= self.max_entries and self._task is not None:
+            if self._early_flush is None or self._early_flush.done():
+                self._early_flush = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Écrit tous les deltas en attente. Retourne le nombre d'utilisateurs mis à jour."""
+        async with self._lock:
+            if not self._deltas:
+                return 0
+            deltas, self._deltas = self._deltas, {}
+            start = time.perf_counter()
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(FLUSH_QUERY, {
+                        "max_fame": MAX_FAME_RATING,
+                        "user_ids": list(deltas),
+                        "amounts": list(deltas.values()),
+                    })
+            except Exception as e:
+                # Les deltas sont remis dans le tampon pour la prochaine tentative
+                for user_id, amount in deltas.items():
+                    self._deltas[user_id] = self._deltas.get(user_id, 0) + amount
+                self.failed_flushes += 1
+                print(f"❌ Erreur lors de l'écriture du fame rating : {e}")
+                return 0
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.flushed_rows += len(deltas)
+            self.flushed_points += sum(deltas.values())
+            return len(deltas)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_ms / 1000)
+            await self.flush()
+
+    def start(self) -> None:
+        """Démarre l'écriture périodique (au démarrage de l'application)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête l'écriture périodique et écrit les deltas restants (à l'arrêt)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Compteurs exposés pour suivre le tampon (deltas en attente vs écrits)."""
+        return {
+            "pending_users": len(self._deltas),
+            "pending_points": sum(self._deltas.values()),
+            "buffered_increments": self.buffered_increments,
+            "buffered_points": self.buffered_points,
+            "flushed_points": self.flushed_points,
+            "flushed_rows": self.flushed_rows,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+            "interval_ms": self.interval_ms,
+            "max_entries": self.max_entries,
+        }
+
+fame_buffer = FameBuffer()
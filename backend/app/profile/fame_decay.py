@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+
+# Le fame rating stocké (profiles.fame_rating) vaut à la date profiles.fame_updated_at ;
+# sa valeur courante décroît ensuite exponentiellement et est calculée à la lecture.
+FAME_HALF_LIFE_HOURS = 24  # La célébrité est divisée par deux en 24 h sans activité
+FAME_HALF_LIFE_SECONDS = FAME_HALF_LIFE_HOURS * 3600
+MAX_FAME_RATING = 50  # Plafond du fame rating stocké (et échelle du score de célébrité)
+
+def decayed_fame_sql(table: str = "profiles", at: str = "NOW()") -> str:
+    """
+    Expression SQL du fame rating (arrondi) d'une ligne de profiles à la date `at`
+    (expression SQL, maintenant par défaut).
+    """
+    return (
+        f"ROUND({table}.fame_rating * POWER(0.5, "
+        f"EXTRACT(EPOCH FROM ({at} - {table}.fame_updated_at)) / {FAME_HALF_LIFE_SECONDS}))"
+    )
+
+def decayed_fame(fame_rating: int | None, updated_at: datetime | None, now: datetime | None = None) -> int:
+    """Fame rating courant (arrondi) à partir de la valeur stockée et de sa date."""
+    if not fame_rating:
+        return 0
+    if updated_at is None:
+        return fame_rating
+    now = now or datetime.now(timezone.utc)
+    elapsed = max((now - updated_at).total_seconds(), 0.0)
+    return round(fame_rating * 0.5 ** (elapsed / FAME_HALF_LIFE_SECONDS))
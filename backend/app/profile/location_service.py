@@ -1,13 +1,81 @@
 from sqlalchemy.sql import text
 from datetime import datetime
 from app.utils.database import engine
-from app.tables.locations import locations_table
+from app.tables.locations import locations_table, GRID_CELL_DEGREES
+from app.match.cache_invalidation import invalidate_caches
+import numpy as np
 import math
 
+EARTH_RADIUS_KM = 6371  # Rayon de la Terre en km
+KM_PER_DEGREE_LAT = 111.32  # Longueur d'un degré de latitude en km
+
+def grid_cell(latitude: float, longitude: float) -> tuple[int, int]:
+    """Retourne la cellule (grid_lat, grid_lon) de la grille spatiale pour un point GPS."""
+    return (
+        math.floor(latitude / GRID_CELL_DEGREES),
+        math.floor(longitude / GRID_CELL_DEGREES),
+    )
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> dict:
+    """
+    Calcule le rectangle (en degrés) englobant le cercle de rayon radius_km.
+    Si le rectangle traverse un pôle ou l'antiméridien, les bornes de longitude
+    valent None (pas de contrainte sur la longitude).
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(-90.0, latitude - delta_lat)
+    max_lat = min(90.0, latitude + delta_lat)
+
+    min_lon = max_lon = None
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat > 1e-6:
+        delta_lon = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+        if delta_lon < 180 and -180 <= longitude - delta_lon and longitude + delta_lon <= 180:
+            min_lon = longitude - delta_lon
+            max_lon = longitude + delta_lon
+
+    return {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+
+def bounding_box_filter(bbox: dict) -> tuple[str, dict]:
+    """
+    Traduit un rectangle en clause SQL sur locations : les bornes sur la grille
+    permettent un parcours de l'index idx_locations_grid, les bornes exactes
+    sur latitude/longitude éliminent le reste de la cellule.
+    """
+    min_grid_lat, _ = grid_cell(bbox["min_lat"], 0)
+    max_grid_lat, _ = grid_cell(bbox["max_lat"], 0)
+    clauses = [
+        "locations.grid_lat BETWEEN :bbox_min_grid_lat AND :bbox_max_grid_lat",
+        "locations.latitude BETWEEN :bbox_min_lat AND :bbox_max_lat",
+    ]
+    params = {
+        "bbox_min_grid_lat": min_grid_lat,
+        "bbox_max_grid_lat": max_grid_lat,
+        "bbox_min_lat": bbox["min_lat"],
+        "bbox_max_lat": bbox["max_lat"],
+    }
+
+    if bbox["min_lon"] is not None and bbox["max_lon"] is not None:
+        _, min_grid_lon = grid_cell(0, bbox["min_lon"])
+        _, max_grid_lon = grid_cell(0, bbox["max_lon"])
+        clauses += [
+            "locations.grid_lon BETWEEN :bbox_min_grid_lon AND :bbox_max_grid_lon",
+            "locations.longitude BETWEEN :bbox_min_lon AND :bbox_max_lon",
+        ]
+        params.update({
+            "bbox_min_grid_lon": min_grid_lon,
+            "bbox_max_grid_lon": max_grid_lon,
+            "bbox_min_lon": bbox["min_lon"],
+            "bbox_max_lon": bbox["max_lon"],
+        })
+
+    return " AND ".join(clauses), params
+
 async def upsert_location(user_id: int, latitude: float, longitude: float, city: str, country: str, location_method: str, mapEnabled: bool):
     """Met à jour ou insère la localisation d'un utilisateur avec mapEnabled."""
     if mapEnabled is None:
         mapEnabled = False
+    grid_lat, grid_lon = grid_cell(latitude, longitude)
     async with engine.begin() as conn:
         # Vérifier si l'utilisateur a déjà une localisation
         check_query = text("SELECT id FROM locations WHERE user_id = :user_id")
@@ -24,7 +92,9 @@ async def upsert_location(user_id: int, latitude: float, longitude: float, city:
                     country = :country, 
                     location_method = :location_method, 
                     map_enabled = :mapEnabled,
-                    last_updated = :last_updated
+                    last_updated = :last_updated,
+                    grid_lat = :grid_lat,
+                    grid_lon = :grid_lon
                 WHERE user_id = :user_id
             """)
             await conn.execute(update_query, {
@@ -36,12 +106,14 @@ async def upsert_location(user_id: int, latitude: float, longitude: float, city:
                 "location_method": location_method,
                 "mapEnabled": mapEnabled,
                 "last_updated": datetime.utcnow(),
+                "grid_lat": grid_lat,
+                "grid_lon": grid_lon,
             })
         else:
             # Insertion d'une nouvelle localisation
             insert_query = text("""
-                INSERT INTO locations (user_id, latitude, longitude, city, country, location_method, map_enabled, last_updated)
-                VALUES (:user_id, :latitude, :longitude, :city, :country, :location_method, :mapEnabled, :last_updated)
+                INSERT INTO locations (user_id, latitude, longitude, city, country, location_method, map_enabled, last_updated, grid_lat, grid_lon)
+                VALUES (:user_id, :latitude, :longitude, :city, :country, :location_method, :mapEnabled, :last_updated, :grid_lat, :grid_lon)
             """)
             await conn.execute(insert_query, {
                 "user_id": user_id,
@@ -52,11 +124,14 @@ async def upsert_location(user_id: int, latitude: float, longitude: float, city:
                 "location_method": location_method,
                 "mapEnabled": mapEnabled,
                 "last_updated": datetime.utcnow(),
+                "grid_lat": grid_lat,
+                "grid_lon": grid_lon,
             })
+    await invalidate_caches(feeds=[user_id])
 
 def haversine(lat1, lon1, lat2, lon2):
-    """Calcule la distance en kilomètres entre deux points GPS."""
-    R = 6371  # Rayon de la Terre en km
+    """Calcule la distance en kilomètres entre deux points GPS (version scalaire)."""
+    R = EARTH_RADIUS_KM
 
     lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
 
@@ -68,6 +143,25 @@ def haversine(lat1, lon1, lat2, lon2):
 
     return R * c  # Distance en kilomètres
 
+def haversine_batch(lat: float, lon: float, latitudes, longitudes) -> np.ndarray:
+    """
+    Calcule en une seule passe vectorisée la distance (km) entre un point
+    et des tableaux de latitudes/longitudes.
+    Les coordonnées manquantes (None/NaN) donnent NaN dans le résultat.
+    """
+    lats = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lons = np.radians(np.asarray(longitudes, dtype=np.float64))
+    lat0 = math.radians(lat)
+    lon0 = math.radians(lon)
+
+    dlat = lats - lat0
+    dlon = lons - lon0
+
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat0) * np.cos(lats) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
 async def get_user_location(conn, user_id):
     """Récupère la localisation (latitude, longitude) d'un utilisateur."""
     query = text("""
@@ -83,6 +177,7 @@ async def get_user_location(conn, user_id):
 
 async def update_location(conn, user_id: int, latitude: float, longitude: float, city: str, country: str, location_method: str, map_enabled: bool):
     """Met à jour la localisation d'un utilisateur dans la base de données."""
+    grid_lat, grid_lon = grid_cell(latitude, longitude)
     query = text("""
         UPDATE locations 
         SET latitude = :latitude, 
@@ -91,7 +186,9 @@ async def update_location(conn, user_id: int, latitude: float, longitude: float,
             country = :country, 
             location_method = :location_method, 
             map_enabled = :map_enabled, 
-            last_updated = :last_updated
+            last_updated = :last_updated,
+            grid_lat = :grid_lat,
+            grid_lon = :grid_lon
         WHERE user_id = :user_id;
     """)
     
@@ -103,6 +200,8 @@ async def update_location(conn, user_id: int, latitude: float, longitude: float,
         "location_method": location_method,
         "map_enabled": map_enabled,
         "last_updated": datetime.utcnow(),
+        "grid_lat": grid_lat,
+        "grid_lon": grid_lon,
         "user_id": user_id
     })
 
@@ -3,8 +3,10 @@ from sqlalchemy.sql import text
 import base64
 from PIL import Image
 from io import BytesIO
+import asyncio
 
 MAX_DIMENSION = 500
+THUMBNAIL_DIMENSION = 240  # Taille des miniatures utilisées dans les listes (avatars ~112px, x2 pour écrans HiDPI)
 
 async def get_pictures_of_user(user_id: int):
     """
@@ -38,13 +40,14 @@ async def count_user_pictures(user_id: int) -> int:
         return result.scalar()
 
 async def insert_picture(user_id: int, image_data: bytes):
+    thumbnail_data = await asyncio.to_thread(make_thumbnail, image_data)
     async with engine.begin() as conn:
         await conn.execute(
             text("""
-                INSERT INTO profile_pictures (user_id, image_data, is_profile_picture)
-                VALUES (:user_id, :image_data, FALSE)
+                INSERT INTO profile_pictures (user_id, image_data, thumbnail_data, is_profile_picture)
+                VALUES (:user_id, :image_data, :thumbnail_data, FALSE)
             """),
-            {"user_id": user_id, "image_data": image_data}
+            {"user_id": user_id, "image_data": image_data, "thumbnail_data": thumbnail_data}
         )
         await ensure_main_picture(conn, user_id)
 
@@ -132,18 +135,107 @@ async def get_main_picture_of_user(user_id: int) -> str | None:
         return base64.b64encode(row[0]).decode("utf-8")
     return None
 
-def process_image(image_bytes: bytes) -> bytes:
+async def get_main_pictures_of_users(user_ids: list[int], thumbnail: bool = True) -> dict[int, str]:
+    """
+    Récupère en une seule requête les images principales (base64) de plusieurs utilisateurs.
+    Par défaut renvoie la miniature (l'image complète si la miniature n'existe pas encore).
+    Les utilisateurs sans photo principale sont absents du dictionnaire.
+    """
+    if not user_ids:
+        return {}
+    column = "COALESCE(thumbnail_data, image_data)" if thumbnail else "image_data"
+    async with engine.begin() as conn:
+        query = text(f"""
+            SELECT user_id, {column} AS data FROM profile_pictures
+            WHERE user_id = ANY(:user_ids) AND is_profile_picture = TRUE
+        """)
+        result = await conn.execute(query, {"user_ids": list(user_ids)})
+        rows = result.fetchall()
+
+    return {row.user_id: base64.b64encode(row.data).decode("utf-8") for row in rows}
+
+async def get_main_thumbnail(user_id: int) -> bytes | None:
+    """Miniature JPEG brute de la photo principale (l'image complète à défaut), ou None."""
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT COALESCE(thumbnail_data, image_data) AS data FROM profile_pictures
+                WHERE user_id = :user_id AND is_profile_picture = TRUE
+                LIMIT 1
+            """),
+            {"user_id": user_id}
+        )
+        row = result.first()
+        return bytes(row.data) if row else None
+
+async def has_main_picture(user_id: int) -> bool:
+    """Retourne True si l'utilisateur a une photo principale (sans charger l'image)."""
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT 1 FROM profile_pictures
+                WHERE user_id = :user_id AND is_profile_picture = TRUE
+                LIMIT 1
+            """),
+            {"user_id": user_id}
+        )
+        return result.first() is not None
+
+# Dernier id traité par le backfill (les photos illisibles sont passées, pas retentées à chaque lot)
+_backfill_after_id = 0
+
+async def backfill_thumbnails(batch_size: int = 100) -> int:
+    """
+    Génère les miniatures manquantes (photos insérées avant leur introduction), par ordre d'id.
+    Chaque photo est traitée dans sa propre transaction et le redimensionnement tourne hors
+    de la boucle asyncio. Retourne le nombre de photos examinées (0 : plus rien à faire).
+    """
+    global _backfill_after_id
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT id, image_data FROM profile_pictures
+                WHERE thumbnail_data IS NULL AND id > :after_id
+                ORDER BY id ASC
+                LIMIT :batch_size
+            """),
+            {"after_id": _backfill_after_id, "batch_size": batch_size}
+        )
+        rows = result.fetchall()
+
+    for row in rows:
+        _backfill_after_id = row.id
+        try:
+            thumbnail_data = await asyncio.to_thread(make_thumbnail, row.image_data)
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text("UPDATE profile_pictures SET thumbnail_data = :thumbnail_data WHERE id = :id"),
+                    {"id": row.id, "thumbnail_data": thumbnail_data}
+                )
+        except Exception as e:
+            # Photo illisible : elle reste servie en taille réelle (COALESCE à la lecture)
+            print(f"⚠️ Miniature impossible pour la photo {row.id} : {e}")
+    return len(rows)
+
+def resize_to_jpeg(image_bytes: bytes, max_dimension: int, quality: int = 80) -> bytes:
     img = Image.open(BytesIO(image_bytes)).convert("RGB")
 
     # Redimensionnement proportionnel
     original_width, original_height = img.size
     max_side = max(original_width, original_height)
-    scale_factor = MAX_DIMENSION / max_side
+    scale_factor = max_dimension / max_side
     new_width = int(original_width * scale_factor)
     new_height = int(original_height * scale_factor)
     img = img.resize((new_width, new_height), Image.LANCZOS)
 
     # Compression JPEG
     output = BytesIO()
-    img.save(output, format="JPEG", quality=80)
-    return output.getvalue()
\ No newline at end of file
+    img.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+def process_image(image_bytes: bytes) -> bytes:
+    return resize_to_jpeg(image_bytes, MAX_DIMENSION)
+
+def make_thumbnail(image_bytes: bytes) -> bytes:
+    """Miniature JPEG utilisée pour les listes de profils et de conversations."""
+    return resize_to_jpeg(image_bytes, THUMBNAIL_DIMENSION, quality=70)
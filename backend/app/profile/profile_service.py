@@ -2,6 +2,10 @@ import json
 from datetime import datetime
 from sqlalchemy.sql import text
 from app.utils.database import engine
+from app.profile.tag_service import normalize_tags, get_or_create_tag_ids
+from app.match.cache_invalidation import invalidate_caches
+from app.profile.fame_buffer import fame_buffer
+from app.profile.fame_decay import decayed_fame
 
 async def upsert_profile(user_id: int, gender: str, sexual_preferences: str, biography: str, interests: list, birthday: str = None):
     """
@@ -12,26 +16,31 @@ async def upsert_profile(user_id: int, gender: str, sexual_preferences: str, bio
     interests_json = json.dumps(interests)  # Convertit la liste en JSON
 
     query = text("""
-    INSERT INTO profiles (user_id, gender, sexual_preferences, biography, interests, birthday, fame_rating)
-    VALUES (:user_id, :gender, :sexual_preferences, :biography, :interests, :birthday, 0)
+    INSERT INTO profiles (user_id, gender, sexual_preferences, biography, interests, tag_ids, birthday, fame_rating)
+    VALUES (:user_id, :gender, :sexual_preferences, :biography, :interests, :tag_ids, :birthday, 0)
     ON CONFLICT (user_id)
     DO UPDATE SET 
         gender = EXCLUDED.gender,
         sexual_preferences = EXCLUDED.sexual_preferences,
         biography = EXCLUDED.biography,
         interests = EXCLUDED.interests,
+        tag_ids = EXCLUDED.tag_ids,
         birthday = EXCLUDED.birthday;
     """)
 
     async with engine.begin() as conn:
+        # Représentation compacte des intérêts (ids de la table tags)
+        tag_ids = await get_or_create_tag_ids(conn, normalize_tags(interests))
         await conn.execute(query, {
             "user_id": user_id,
             "gender": gender,
             "sexual_preferences": sexual_preferences,
             "biography": biography,
             "interests": interests_json,
+            "tag_ids": tag_ids,
             "birthday": birthday_date
         })
+    await invalidate_caches(feeds=[user_id])
 
 async def get_profile_by_user_id(id: int):
     """
@@ -58,23 +67,12 @@ async def get_profile_by_user_id(id: int):
         "biography": profile_dict["biography"],
         "interests": profile_dict["interests"],  # Peut être en JSON
         "birthday": profile_dict["birthday"].strftime("%Y-%m-%d") if profile_dict["birthday"] else None,
-        "fame_rating": profile_dict["fame_rating"]
+        "fame_rating": decayed_fame(profile_dict["fame_rating"], profile_dict.get("fame_updated_at"))
     }
 
 async def increment_fame_rating(user_id: int, amount: int = 1):
-    """Incrémente le fame_rating d'un utilisateur, sans dépasser 50."""
-    async with engine.begin() as conn:
-        query = text("""
-            UPDATE profiles
-            SET fame_rating = LEAST(50, fame_rating + :amount)
-            WHERE user_id = :user_id;
-        """)
-        await conn.execute(query, {
-            "user_id": user_id,
-            "amount": amount
-        })
-
-async def reset_fame_ratings():
-    async with engine.begin() as conn:
-        query = text("UPDATE profiles SET fame_rating = 0")
-        await conn.execute(query)
\ No newline at end of file
+    """
+    Incrémente le fame_rating d'un utilisateur, sans dépasser 50.
+    L'écriture est différée et groupée par `fame_buffer`.
+    """
+    fame_buffer.add(user_id, amount)
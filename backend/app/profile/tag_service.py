@@ -0,0 +1,60 @@
+from sqlalchemy.sql import text
+from app.utils.database import engine
+import json
+
+def normalize_tags(tags) -> list[str]:
+    """Normalise une liste de tags (minuscules, sans espaces, sans doublons)."""
+    if not isinstance(tags, list):
+        return []
+    return sorted({tag.strip().lower() for tag in tags if isinstance(tag, str) and tag.strip()})
+
+def parse_interests(interests: str | None) -> list[str]:
+    """Retourne les tags normalisés d'une chaîne JSON d'intérêts (liste vide si invalide)."""
+    try:
+        return normalize_tags(json.loads(interests) if interests else [])
+    except json.JSONDecodeError:
+        return []
+
+async def get_or_create_tag_ids(conn, names: list[str]) -> list[int]:
+    """Retourne les ids des tags donnés (déjà normalisés), en créant ceux qui manquent."""
+    if not names:
+        return []
+    await conn.execute(
+        text("""
+            INSERT INTO tags (name)
+            SELECT unnest(CAST(:names AS TEXT[]))
+            ON CONFLICT (name) DO NOTHING
+        """),
+        {"names": names}
+    )
+    result = await conn.execute(
+        text("SELECT id FROM tags WHERE name = ANY(:names) ORDER BY id"),
+        {"names": names}
+    )
+    return [row[0] for row in result.fetchall()]
+
+async def migrate_interests_to_tag_ids(batch_size: int = 500):
+    """
+    Migration : remplit profiles.tag_ids à partir des intérêts JSON existants
+    pour les profils qui n'ont pas encore de représentation normalisée.
+    """
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT user_id, interests FROM profiles
+                    WHERE tag_ids IS NULL
+                    LIMIT :batch_size
+                """),
+                {"batch_size": batch_size}
+            )
+            rows = result.fetchall()
+            if not rows:
+                return
+
+            for row in rows:
+                tag_ids = await get_or_create_tag_ids(conn, parse_interests(row.interests))
+                await conn.execute(
+                    text("UPDATE profiles SET tag_ids = :tag_ids WHERE user_id = :user_id"),
+                    {"tag_ids": tag_ids, "user_id": row.user_id}
+                )
@@ -1,20 +1,42 @@
 from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
 from app.utils.jwt_handler import verify_user_from_token, verify_user_from_socket_token
-from app.profile.block_service import are_users_blocked
 from app.routers.notifications import send_notification
 from fastapi.responses import JSONResponse
 from app.chat.chat_service import (
     get_user_conversations_from_db, get_messages_from_conversation, get_conversation_users, insert_message,
     insert_date_invite, get_latest_invite, update_invite_status,
-    save_user_preferences, get_preferences)
+    save_user_preferences, get_preferences, mark_conversation_read)
+from app.chat.chat_events import broadcast_to_conversation
+from app.chat.typing_service import typing_coalescer
+from app.utils.pubsub import pubsub
+from app.utils.connections import Connection
+from app.routers import realtime
 from jose import JWTError, jwt
-from app.match.match_service import check_if_unliked
-import json, base64
+import json
 
 router = APIRouter()
+MAX_MESSAGES_PAGE_SIZE = 200
 
-#  Stockage des connexions WebSocket actives
-active_connections = {}
+#  Stockage des connexions WebSocket actives (de ce worker) : conversation_id -> [(user_id, Connection)]
+active_connections: dict[int, list[tuple[int, Connection]]] = {}
+
+async def deliver_conversation_event(data: dict):
+    """Met un événement de conversation en file pour les WebSockets locales concernées (sans attendre les clients)."""
+    message = json.dumps(data["payload"])
+    for user_socket_id, connection in list(active_connections.get(data["conversation_id"], [])):
+        if data["user_ids"] is not None and user_socket_id not in data["user_ids"]:
+            continue
+        if user_socket_id == data["exclude_user_id"]:
+            continue
+        connection.send(message)
+
+    realtime.deliver_to_conversation(
+        data["conversation_id"],
+        realtime.encode_frame(data["frame_type"], data["payload"], data["conversation_id"]),
+        user_ids=data["user_ids"], exclude_user_id=data["exclude_user_id"],
+    )
+
+pubsub.subscribe("conversation", deliver_conversation_event)
 @router.get("/conversations")
 async def get_user_conversations(request: Request):
     user = await verify_user_from_token(request)
@@ -22,40 +44,39 @@ async def get_user_conversations(request: Request):
         return user
     user_id = user["id"]
 
-    raw_conversations = await get_user_conversations_from_db(user_id)
-
-    filtered = []
-    for row in raw_conversations:
-        other_id = row.other_user_id
-
-        # Ne pas afficher si bloqué
-        if await are_users_blocked(user_id, other_id):
-            continue
-
-        # Ne pas afficher si un des deux a unliked l'autre
-        if await check_if_unliked(user_id, other_id) or await check_if_unliked(other_id, user_id):
-            continue
-
-        avatar = (
-            f"data:image/jpeg;base64,{base64.b64encode(row.profile_picture).decode('utf-8')}"
-            if row.profile_picture else None
-        )
-        filtered.append({
+    # Blocages, unlikes, dernier message et non lus sont calculés par la requête
+    rows = await get_user_conversations_from_db(user_id)
+    return [
+        {
             "id": row.conversation_id,
             "name": row.other_username,
-            "avatar": avatar,
+            # Miniature servie par /profile/thumbnail (le frontend préfixe l'URL de l'API)
+            "avatar": f"/profile/thumbnail/{row.other_user_id}" if row.has_picture else None,
             "isOnline": row.is_online,
-            "other_user_id": other_id
-        })
-
-    return filtered
+            "other_user_id": row.other_user_id,
+            "last_message": row.last_message,
+            "last_message_type": row.last_message_type,
+            "last_message_sender_id": row.last_message_sender_id,
+            "last_message_at": str(row.last_message_at) if row.last_message_at else None,
+            "last_read_message_id": row.last_read_message_id,
+            "unread_count": row.unread_count,
+        }
+        for row in rows
+    ]
 
 @router.get("/messages/{conversation_id}")
-async def get_messages(conversation_id: int, request: Request):
+async def get_messages(conversation_id: int, request: Request,
+                       before_id: int | None = None, after_id: int | None = None, limit: int | None = None):
+    """
+    Historique d'une conversation. Paramètres optionnels : `limit` (taille de page),
+    `before_id` (page plus ancienne) et `after_id` (messages reçus après cet id).
+    """
     user = await verify_user_from_token(request)
     if isinstance(user, JSONResponse):
         return user
-    rows = await get_messages_from_conversation(conversation_id)
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_MESSAGES_PAGE_SIZE)
+    rows = await get_messages_from_conversation(conversation_id, before_id=before_id, after_id=after_id, limit=limit)
     return [
         {
             "id": row.id,
@@ -84,17 +105,20 @@ async def send_message(request: Request, data: dict):
 
     message_id, timestamp = await insert_message(conversation_id, sender_id, content)
 
-    for user_socket in active_connections.get(conversation_id, []):
-        user_socket_id, ws = user_socket
-        if user_socket_id in {sender_id, receiver_id}:
-            await ws.send_text(json.dumps({
-                "id": message_id,
-                "sender_id": sender_id,
-                "content": content,
-                "timestamp": str(timestamp)
-            }))
-
-    if not any(user_socket_id == receiver_id for user_socket_id, _ in active_connections.get(conversation_id, [])):
+    await broadcast_to_conversation(conversation_id, "message", {
+        "id": message_id,
+        "sender_id": sender_id,
+        "content": content,
+        "timestamp": str(timestamp)
+    }, user_ids=[sender_id, receiver_id])
+
+    # Présence vue par ce worker : si le destinataire a la conversation ouverte
+    # sur un autre worker, il reçoit aussi la notification
+    receiver_viewing = (
+        any(user_socket_id == receiver_id for user_socket_id, _ in active_connections.get(conversation_id, []))
+        or realtime.is_subscribed(receiver_id, conversation_id)
+    )
+    if not receiver_viewing:
         await send_notification(
             receiver_id=receiver_id,
             sender_id=sender_id,
@@ -104,6 +128,20 @@ async def send_message(request: Request, data: dict):
 
     return {"success": True, "message": "Message envoyé"}
 
+@router.post("/read")
+async def mark_read(request: Request, data: dict):
+    """
+    Marque une conversation comme lue jusqu'au message `message_id` inclus.
+    Body : {chat_id, message_id}. Retourne le filigrane et le nombre de non lus restants.
+    """
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    state = await mark_conversation_read(data["chat_id"], user["id"], data["message_id"])
+    if state is None:
+        return {"success": False, "detail": "Conversation introuvable"}
+    return {"success": True, **state}
+
 @router.websocket("/ws/{conversation_id}")
 async def websocket_endpoint(websocket: WebSocket, conversation_id: int):
     """ WebSocket sécurisé avec JWT en Cookie HTTPOnly """
@@ -121,19 +159,37 @@ async def websocket_endpoint(websocket: WebSocket, conversation_id: int):
         await websocket.close(code=1008)
         return
     await websocket.accept()
-    active_connections.setdefault(conversation_id, []).append((user["id"], websocket))
+    connection = Connection(websocket, user["id"])
+    connection.start()
+    active_connections.setdefault(conversation_id, []).append((user["id"], connection))
 
     try:
         while True:
-            await websocket.receive_text()  # Maintenir la connexion
-    except WebSocketDisconnect:
+            # Seules les trames de frappe {"event": "typing", "typing": bool} sont attendues
+            raw = await websocket.receive_text()
+            try:
+                frame = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(frame, dict) and frame.get("event") == "typing":
+                await typing_coalescer.update(user["id"], user["username"], conversation_id, bool(frame.get("typing")))
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # Fermée par le client, ou par le serveur (client lent)
+    finally:
+        await connection.close()
         active_connections[conversation_id] = [
-            conn for conn in active_connections[conversation_id] if conn[1] != websocket
+            conn for conn in active_connections.get(conversation_id, []) if conn[1] is not connection
         ]
+        if not active_connections[conversation_id]:
+            del active_connections[conversation_id]
 
 @router.post("/typing")
 async def typing_status(request: Request, data: dict):
-    """Informe chaque utilisateur dans la conversation si l'autre est en train d'écrire."""
+    """
+    Informe chaque utilisateur dans la conversation si l'autre est en train d'écrire.
+    Conservé pour les anciens clients : les trames de frappe sur la WebSocket évitent
+    une requête HTTP par frappe. Les deux passent par le même regroupement.
+    """
     user = await verify_user_from_token(request)
     if isinstance(user, JSONResponse):
         return user
@@ -141,19 +197,26 @@ async def typing_status(request: Request, data: dict):
     conversation_id = data["chat_id"]
     is_typing = data["is_typing"]  # Boolean : True -> Tape, False -> Arrête
 
-    # Vérifier si l’autre utilisateur est connecté via WebSocket
-    if conversation_id in active_connections:
-        for other_user_id, ws in active_connections[conversation_id]:
-            if other_user_id != sender_id:  # Ne pas notifier l'auteur lui-même
-                await ws.send_text(json.dumps({
-                    "event": "typing",
-                    "typing": is_typing,
-                    "username": user["username"]
-                }))
+    # Seuls les débuts et fins de frappe sont diffusés, quel que soit le worker des participants
+    await typing_coalescer.update(sender_id, user["username"], conversation_id, bool(is_typing))
 
     return {"success": True, "message": "Typing status updated"}
 
-active_video_connections: dict[int, list[tuple[int, WebSocket]]] = {}
+active_video_connections: dict[int, list[tuple[int, Connection]]] = {}
+
+async def deliver_video_event(data: dict):
+    """Relaie un message de signalisation vidéo aux autres participants locaux."""
+    for uid, connection in list(active_video_connections.get(data["conversation_id"], [])):
+        if uid != data["sender_id"]:
+            connection.send(data["raw"])
+    # `raw` est du JSON déjà validé : la trame est composée sans le re-décoder
+    realtime.deliver_to_conversation(
+        data["conversation_id"],
+        f'{{"type": "video", "conversation_id": {data["conversation_id"]}, "data": {data["raw"]}}}',
+        exclude_user_id=data["sender_id"],
+    )
+
+pubsub.subscribe("video", deliver_video_event)
 
 @router.websocket("/ws/video/{conversation_id}")
 async def video_websocket(websocket: WebSocket, conversation_id: int):
@@ -171,24 +234,28 @@ async def video_websocket(websocket: WebSocket, conversation_id: int):
         return
     await websocket.accept()
     user_id = user["id"]
-    active_video_connections.setdefault(conversation_id, []).append((user_id, websocket))
+    connection = Connection(websocket, user_id)
+    connection.start()
+    active_video_connections.setdefault(conversation_id, []).append((user_id, connection))
     print(f"✅ Video WebSocket ouverte pour user {user_id} dans la conversation {conversation_id}")
 
     try:
         while True:
             raw = await websocket.receive_text()
-            data = json.loads(raw)
-
-            # On broadcast l'événement à l'autre utilisateur
-            for uid, conn in active_video_connections[conversation_id]:
-                if uid != user_id:
-                    try:
-                        await conn.send_text(raw)
-                    except Exception as e:
-                        print(f"⚠️ Impossible d’envoyer à {uid} : {e}")
-    except WebSocketDisconnect:
+            json.loads(raw)  # Rejette les messages qui ne sont pas du JSON
+
+            # On broadcast l'événement à l'autre utilisateur (offres SDP volumineuses découpées par le pub/sub)
+            await pubsub.publish("video", {
+                "conversation_id": conversation_id,
+                "sender_id": user_id,
+                "raw": raw,
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await connection.close()
         active_video_connections[conversation_id] = [
-            conn for conn in active_video_connections[conversation_id] if conn[1] != websocket
+            conn for conn in active_video_connections.get(conversation_id, []) if conn[1] is not connection
         ]
         if not active_video_connections[conversation_id]:
             del active_video_connections[conversation_id]
@@ -218,20 +285,20 @@ async def send_date_invite(request: Request):
 
     await insert_date_invite(chat_id, sender_id)
 
-    await insert_message(
+    message_id, _ = await insert_message(
         conversation_id=chat_id,
         sender_id=sender_id,
         content=f"{user['username']} vous invite à planifier un rendez-vous.",
         type_="date_invite"
     )
 
-    for _, ws in active_connections.get(chat_id, []):
-        await ws.send_text(json.dumps({
-            "type": "date_invite",
-            "sender_id": sender_id,
-            "sender_name": user["username"],
-            "status": "pending"
-        }))
+    await broadcast_to_conversation(chat_id, "date_invite", {
+        "type": "date_invite",
+        "id": message_id,
+        "sender_id": sender_id,
+        "sender_name": user["username"],
+        "status": "pending"
+    })
 
     return {"success": True, "ok": True}
 
@@ -253,20 +320,20 @@ async def respond_to_date_invite(request: Request):
     await update_invite_status(chat_id, status)
 
     print("insert message respond_to_date_invite? valeur de user_id: ", user_id)
-    await insert_message(
+    message_id, _ = await insert_message(
         conversation_id=chat_id,
         sender_id=user_id,
         content="Invitation acceptée." if accepted else "Invitation refusée.",
         type_="date_invite"
     )
 
-    for _, ws in active_connections.get(chat_id, []):
-        await ws.send_text(json.dumps({
-            "type": "date_invite",
-            "sender_id": user_id,
-            "sender_name": user["username"],
-            "status": status
-        }))
+    await broadcast_to_conversation(chat_id, "date_invite", {
+        "type": "date_invite",
+        "id": message_id,
+        "sender_id": user_id,
+        "sender_name": user["username"],
+        "status": status
+    })
 
     return {"success": True, "ok": True}
 
@@ -322,19 +389,19 @@ async def submit_preferences(request: Request):
     )
     print("insert message submit_preferences? valeur de user_id: ", user_id)
 
-    await insert_message(
+    message_id, _ = await insert_message(
         conversation_id=chat_id,
         sender_id=user_id,
         content=message,
         type_="system"
     )
 
-    for _, ws in active_connections.get(chat_id, []):
-        await ws.send_text(json.dumps({
-            "type": "date_result",
-            "status": "success" if activity and moment else "no_match",
-            "message": message
-        }))
+    await broadcast_to_conversation(chat_id, "date_result", {
+        "type": "date_result",
+        "id": message_id,
+        "status": "success" if activity and moment else "no_match",
+        "message": message
+    })
 
     return {"success": True, "ok": True}
 
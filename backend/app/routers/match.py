@@ -1,18 +1,82 @@
 from fastapi import APIRouter, Request
 from app.utils.jwt_handler import verify_user_from_token
-from app.utils.database import engine
-from fastapi.responses import JSONResponse
-from app.chat.chat_service import create_conversation
-from app.match.match_service import check_same_like, insert_like, check_match, get_liked_user_ids, get_matching_profiles, enrich_profiles, sort_profiles, set_unlike_status, check_if_unliked
-from app.user.user_service import get_user_by_id
-from app.profile.block_service import are_users_blocked, async_generator_filter
-from app.profile.location_service import haversine, get_user_location, is_map_enabled_for_user
-from app.routers.notifications import send_notification
-from app.profile.profile_service import get_profile_by_user_id, increment_fame_rating
-from app.profile.picture_service import get_main_picture_of_user
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.match.match_service import like, like_many, MAX_LIKE_BATCH_SIZE, get_discovery_context, fetch_matching_profiles, build_profile_filters, enrich_profiles, paginate_profiles, pagination_fame_at, set_unlike_status
+from app.profile.block_service import get_blocked_user_ids
+from app.routers.notifications import send_notification, send_notifications
+from app.profile.picture_service import get_main_pictures_of_users, has_main_picture
+from app.match.feed_cache import feed_cache
+from app.match.ranking_engine import apply_scores
+import asyncio
 import json
 
 router = APIRouter()
+MAX_PAGE_SIZE = 100
+STREAM_CHUNK_SIZE = 10
+
+def parse_page_params(query_params):
+    """
+    Lit les paramètres de pagination : `cursor` (opaque), `limit` (taille de page)
+    et `stream` (réponse NDJSON). Sans `limit`, tous les profils sont renvoyés.
+    Lève ValueError si `limit` n'est pas un entier.
+    """
+    cursor = query_params.get("cursor") or None
+    limit = query_params.get("limit")
+    try:
+        page_size = min(max(int(limit), 1), MAX_PAGE_SIZE) if limit else None
+    except ValueError:
+        raise ValueError("Invalid limit")
+    stream = query_params.get("stream", "false").lower() == "true"
+    return cursor, page_size, stream
+
+async def build_feed_response(user_id, profiles, fame_at, map_enabled, user_lat, user_lon, cursor, page_size, stream):
+    """
+    Classe la page demandée (top-K), ajoute les photos principales et construit la réponse
+    (JSON classique, ou NDJSON en streaming : meta, puis un profil par ligne, puis end).
+    `fame_at` est la date de calcul des fame ratings des profils (reportée dans le curseur).
+    """
+    try:
+        page, next_cursor = await paginate_profiles(profiles, fame_at, cursor, page_size)
+    except ValueError:
+        return {"success": False, "detail": "Invalid cursor"}
+    # Copies : les profils peuvent venir du cache et ne doivent pas garder les photos
+    page = [dict(profile) for profile in page]
+
+    meta = {}
+    if map_enabled:
+        meta["user_location"] = {
+            "latitude": user_lat,
+            "longitude": user_lon
+        }
+
+    if stream:
+        async def ndjson_lines():
+            meta["can_like"] = await has_main_picture(user_id)
+            yield json.dumps({"type": "meta", **meta}) + "\n"
+            # Photos chargées par petits lots pour envoyer les premières cartes au plus tôt
+            for i in range(0, len(page), STREAM_CHUNK_SIZE):
+                chunk = page[i:i + STREAM_CHUNK_SIZE]
+                pictures = await get_main_pictures_of_users([profile["id"] for profile in chunk])
+                for profile in chunk:
+                    profile["main_picture"] = pictures.get(profile["id"])
+                    yield json.dumps({"type": "profile", "profile": profile}) + "\n"
+            yield json.dumps({"type": "end", "next_cursor": next_cursor}) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    # Miniatures de toute la page en une seule requête, en parallèle du test de photo du user
+    meta["can_like"], pictures = await asyncio.gather(
+        has_main_picture(user_id),
+        get_main_pictures_of_users([profile["id"] for profile in page]),
+    )
+    for profile in page:
+        profile["main_picture"] = pictures.get(profile["id"])
+
+    return {
+        **meta,
+        "profiles": page,
+        "next_cursor": next_cursor,
+    }
 
 @router.get("/profiles")
 async def get_profiles(request: Request):
@@ -21,62 +85,67 @@ async def get_profiles(request: Request):
     if isinstance(user, JSONResponse):
         return user
     user_id = user["id"]
-
-    async with engine.begin() as conn:
-        map_enabled = await is_map_enabled_for_user(conn, user_id)
-        # Récupérer localisation user (via `locations_service`)
-        try:
-            user_lat, user_lon = await get_user_location(conn, user_id)
-        except Exception:
+    try:
+        cursor, page_size, stream = parse_page_params(request.query_params)
+    except ValueError:
+        return {"success": False, "detail": "Invalid limit"}
+    try:
+        cursor_fame_at = pagination_fame_at(cursor) if cursor else None
+    except ValueError:
+        return {"success": False, "detail": "Invalid cursor"}
+
+    # Classement en cache (invalidé par les likes, blocages, changements de profil/localisation).
+    # Une page suivante reprend les fame ratings à la date de son curseur.
+    feed = feed_cache.get(user_id)
+    if feed is None or (cursor_fame_at is not None and feed["fame_at"] != cursor_fame_at):
+        feed = await compute_feed(user_id, cursor_fame_at)
+        if feed is None:
             return {"success": False, "detail": "Localisation non trouvée."}
+        if cursor_fame_at is None:
+            feed_cache.set(user_id, feed)
 
-        # Récupérer profil user (via `profile_service`)
-        user_profile = await get_profile_by_user_id(user_id)
-        gender, preferences, user_interests = (
-            user_profile["gender"], 
-            user_profile["sexual_preferences"], 
-            user_profile["interests"]
-        )
-
-        # Récupérer profils likés (via `match_service`)
-        liked_user_ids = await get_liked_user_ids(conn, user_id)
-
-        # Récupérer profils selon préférences (via `match_service`)
-        profiles = await get_matching_profiles(conn, user_id, gender, preferences)
+    user_lat, user_lon = feed["user_location"]
+    return await build_feed_response(
+        user_id, feed["profiles"], feed["fame_at"], feed["map_enabled"], user_lat, user_lon, cursor, page_size, stream
+    )
 
-        # Ajouter distance, âge et tags communs (via `match_service`)
-        profiles_with_details = await enrich_profiles(
-            user_lat, user_lon, user_interests, liked_user_ids, profiles, include_coords=map_enabled
-        )
+async def compute_feed(user_id, fame_at=None):
+    """
+    Calcule le fil de découverte classé d'un utilisateur (None si pas de localisation),
+    avec les fame ratings à la date `fame_at` (maintenant par défaut).
+    """
+    fame_at = fame_at or pagination_fame_at()
+    # Contexte utilisateur (localisation, carte, profil, likes) en un seul aller-retour
+    context = await get_discovery_context(user_id)
+    if context is None:
+        return None
+
+    # Candidats et blocages sont indépendants : requêtes concurrentes sur deux connexions
+    profiles, blocked_ids = await asyncio.gather(
+        fetch_matching_profiles(user_id, context["gender"], context["sexual_preferences"]),
+        get_blocked_user_ids(user_id),
+    )
 
-    async def is_not_blocked(profile):
-        return not await are_users_blocked(user_id, profile["id"])
+    # Ajouter distance, âge et tags communs (via `match_service`)
+    profiles_with_details = await enrich_profiles(
+        context["latitude"], context["longitude"], context["liked_ids"],
+        profiles, include_coords=context["map_enabled"], fame_at=fame_at
+    )
 
+    # Filtrage en mémoire des relations de blocage (dans les deux sens)
     not_blocked_profiles = [
-        profile async for profile in async_generator_filter(profiles_with_details, is_not_blocked)
+        profile for profile in profiles_with_details if profile["id"] not in blocked_ids
     ]
 
-    # Trier les profils selon distance > tags > fame rating
-    sorted_profiles = await sort_profiles(not_blocked_profiles)
-
-    for profile in sorted_profiles:
-        profile["main_picture"] = await get_main_picture_of_user(profile["id"])
-
-    has_main_picture = bool(await get_main_picture_of_user(user_id))
-    
-    result = {
-        "can_like": has_main_picture,
-        "profiles": sorted_profiles,
+    # Score pondéré calculé une fois (si activé) ; le tri est fait page par page dans `paginate_profiles`
+    apply_scores(not_blocked_profiles, context)
+    return {
+        "profiles": not_blocked_profiles,
+        "fame_at": fame_at,
+        "map_enabled": bool(context["map_enabled"]),
+        "user_location": (context["latitude"], context["longitude"]),
     }
 
-    if map_enabled:
-        result["user_location"] = {
-            "latitude": user_lat,
-            "longitude": user_lon
-        }
-
-    return result
-    
 @router.get("/filter_profiles")
 async def filter_profiles(request: Request):
     """Récupère les profils filtrés par âge, distance, célébrité et tags."""
@@ -91,6 +160,14 @@ async def filter_profiles(request: Request):
     minFame = int(query_params.get("minFame", 1)) * 10
     maxFame = int(query_params.get("maxFame", 5)) * 10
     filterByTags = query_params.get("filterByTags", "false").lower() == "true"
+    try:
+        cursor, page_size, stream = parse_page_params(query_params)
+    except ValueError:
+        return {"success": False, "detail": "Invalid limit"}
+    try:
+        fame_at = pagination_fame_at(cursor)
+    except ValueError:
+        return {"success": False, "detail": "Invalid cursor"}
    
     #Vérifier l'utilisateur connecté
     user = await verify_user_from_token(request)
@@ -98,70 +175,52 @@ async def filter_profiles(request: Request):
         return user
     user_id = user["id"]
 
-    async with engine.begin() as conn:
-        map_enabled = await is_map_enabled_for_user(conn, user_id)
-        # Récupérer localisation user (via `get_user_location`)
-        try:
-            user_lat, user_lon = await get_user_location(conn, user_id)
-        except Exception:
-            return {"success": False, "detail": "Localisation non trouvée."}
-
-        # Récupérer profil user (via `get_profile_by_user_id`)
-        user_profile = await get_profile_by_user_id(user_id)
-        gender, preferences, user_interests = (
-            user_profile["gender"], 
-            user_profile["sexual_preferences"], 
-            user_profile["interests"]
-        )
-
-        # Récupérer profils likés (via `get_liked_user_ids`)
-        liked_user_ids = await get_liked_user_ids(conn, user_id)
+    # Contexte utilisateur (localisation, carte, profil, likes) en un seul aller-retour
+    context = await get_discovery_context(user_id)
+    if context is None:
+        return {"success": False, "detail": "Localisation non trouvée."}
+    user_lat, user_lon, map_enabled = context["latitude"], context["longitude"], context["map_enabled"]
+
+    # Récupérer profils selon préférences (via `fetch_matching_profiles`) :
+    # âge, célébrité et rectangle de distance sont filtrés directement par Postgres
+    max_distance_km = None if maxDistance == "world" else int(maxDistance)
+    filters = build_profile_filters(
+        min_age=minAge,
+        max_age=maxAge,
+        min_fame=minFame,
+        max_fame=maxFame,
+        center=(user_lat, user_lon),
+        max_distance_km=max_distance_km,
+        fame_at=fame_at,
+    )
+    # Candidats et blocages sont indépendants : requêtes concurrentes sur deux connexions
+    profiles, blocked_ids = await asyncio.gather(
+        fetch_matching_profiles(user_id, context["gender"], context["sexual_preferences"], filters=filters),
+        get_blocked_user_ids(user_id),
+    )
 
-        # Récupérer profils selon préférences (via `get_matching_profiles`)
-        profiles = await get_matching_profiles(conn, user_id, gender, preferences)
+    # Enrichir les profils avec distance, âge, tags (via `enrich_profiles`)
+    enriched_profiles = await enrich_profiles(
+        user_lat, user_lon, context["liked_ids"], profiles, include_coords=map_enabled, fame_at=fame_at
+    )
 
-        # Enrichir les profils avec distance, âge, tags (via `enrich_profiles`)
-        enriched_profiles = await enrich_profiles(
-            user_lat, user_lon, user_interests, liked_user_ids, profiles, include_coords=map_enabled
+    # Filtrer sur la distance exacte, les tags et les blocages (le reste est déjà filtré en SQL)
+    filtered_profiles = [
+        profile for profile in enriched_profiles
+        if (
+            profile["id"] not in blocked_ids and
+            (max_distance_km is None or (
+                profile["distance_km"] is not None and minDistance <= profile["distance_km"] <= max_distance_km
+            )) and
+            (not filterByTags or profile["common_tags"] > 0)
         )
-
-        for profile in enriched_profiles:
-            print("profile:", profile["id"], "fame_rating =", profile.get("fame_rating"))
-
-        # Filtrer selon critères fournis
-        filtered_profiles = [
-            profile for profile in enriched_profiles
-            if (
-                (minAge <= profile["age"] <= maxAge) and
-                (minFame <= profile.get("fame_rating", 0) <= maxFame) and
-                (maxDistance == "world" or (minDistance <= profile["distance_km"] <= int(maxDistance))) and
-                (not filterByTags or profile["common_tags"] > 0)
-            )
-        ]
-    async def is_not_blocked(profile):
-        return not await are_users_blocked(user_id, profile["id"])
-
-    not_blocked_profiles = [
-        profile async for profile in async_generator_filter(filtered_profiles, is_not_blocked)
     ]
-    # ajout des images de profile
-    for profile in not_blocked_profiles:
-        profile["main_picture"] = await get_main_picture_of_user(profile["id"])
-
-    has_main_picture = bool(await get_main_picture_of_user(user_id))
-    
-    result = {
-        "can_like": has_main_picture,
-        "profiles": not_blocked_profiles,
-    }
 
-    if map_enabled:
-        result["user_location"] = {
-            "latitude": user_lat,
-            "longitude": user_lon
-        }
-
-    return result
+    # Classement top-K de la page demandée selon la stratégie de `ranking_engine`
+    apply_scores(filtered_profiles, context)
+    return await build_feed_response(
+        user_id, filtered_profiles, fame_at, map_enabled, user_lat, user_lon, cursor, page_size, stream
+    )
 
 @router.post("/like")
 async def like_profile(request: Request, data: dict):
@@ -171,43 +230,30 @@ async def like_profile(request: Request, data: dict):
         return user
     liker_id = user["id"]
     liked_id = data.get("targetId")
-    user_liked = await get_user_by_id(liked_id)
 
-    if liker_id == liked_id:
-        return {"success": False, "detail": "You cannot like yourself"}
+    # Vérifications, like, match, conversation et fame rating en une transaction
+    result = await like(liker_id, liked_id)
+    status = result["status"]
 
-    if await are_users_blocked(liker_id, liked_id):
-        return {"matched": False}
-    
-    # Si un des deux utilisateurs a unliked l’autre → aucun effet
-    if await check_if_unliked(liker_id, liked_id) or await check_if_unliked(liked_id, liker_id):
+    if status == "self":
+        return {"success": False, "detail": "You cannot like yourself"}
+    if status == "not_found":
+        return {"success": False, "detail": "User not found"}
+    # Blocage ou unlike dans un sens ou dans l'autre → aucun effet
+    if status in ("blocked", "unliked"):
         return {"matched": False}
-
-    # Vérifie que le liker a une photo
-    main_pic = await get_main_picture_of_user(liker_id)
-    if not main_pic:
+    if status == "no_picture":
         return {"success": False, "detail": "You must upload a profile picture before liking others."}
-
-    # Vérifie si l'utilisateur a déjà liké
-    if await check_same_like(liker_id, liked_id):
+    if status == "already_liked":
         return {"success": False, "detail": "You already liked this user"}
 
-    # Insère le like
-    await insert_like(liker_id, liked_id)
-
-    await increment_fame_rating(liked_id, amount=3)
-
-    # Vérifie si c'est un match
-    if await check_match(liker_id, liked_id):
-        # Crée la conversation
-        await create_conversation(liker_id, liked_id)
-
+    if status == "matched":
         # Notifications croisées
         await send_notification(
             receiver_id=liker_id,
             sender_id=liked_id,
             notification_type="match",
-            context=f"Vous avez matché avec {user_liked['username']} ! 🎉"
+            context=f"Vous avez matché avec {result['target_username']} ! 🎉"
         )
         await send_notification(
             receiver_id=liked_id,
@@ -215,8 +261,6 @@ async def like_profile(request: Request, data: dict):
             notification_type="match",
             context=f"Vous avez matché avec {user['username']} ! 🎉"
         )
-        await increment_fame_rating(liker_id, amount=7)
-        await increment_fame_rating(liked_id, amount=7)
         return {"success": True, "matched": True}
 
     # Notification pour un simple like (pas encore un match)
@@ -229,6 +273,60 @@ async def like_profile(request: Request, data: dict):
 
     return {"success": True, "matched": False}
 
+@router.post("/like/batch")
+async def like_profiles_batch(request: Request, data: dict):
+    """Like groupé (session de swipe) : un résultat par profil ciblé."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    liker_id = user["id"]
+    target_ids = data.get("targetIds")
+
+    if not isinstance(target_ids, list) or not all(isinstance(t, int) for t in target_ids):
+        return {"success": False, "detail": "targetIds must be a list of user ids"}
+    if len(target_ids) > MAX_LIKE_BATCH_SIZE:
+        return {"success": False, "detail": f"At most {MAX_LIKE_BATCH_SIZE} likes per batch"}
+
+    results = await like_many(liker_id, target_ids)
+
+    # Notifications de like et de match croisées, insérées en une seule requête
+    notifications = []
+    for target_id, result in results.items():
+        if result["status"] == "matched":
+            notifications.append({
+                "receiver_id": liker_id,
+                "sender_id": target_id,
+                "type": "match",
+                "context": f"Vous avez matché avec {result['target_username']} ! 🎉",
+            })
+            notifications.append({
+                "receiver_id": target_id,
+                "sender_id": liker_id,
+                "type": "match",
+                "context": f"Vous avez matché avec {user['username']} ! 🎉",
+            })
+        elif result["status"] == "liked":
+            notifications.append({
+                "receiver_id": target_id,
+                "sender_id": liker_id,
+                "type": "like",
+                "context": f"{user['username']} a liké votre profil ❤️",
+            })
+    await send_notifications(notifications)
+
+    return {
+        "success": True,
+        "results": [
+            {
+                "targetId": target_id,
+                "status": result["status"],
+                "matched": result["status"] == "matched",
+                "conversation_id": result["conversation_id"],
+            }
+            for target_id, result in results.items()
+        ],
+    }
+
 @router.post("/unlike")
 async def unlike_user(request: Request, data: dict):
     """Permet de 'unlike' un utilisateur, empêche toute interaction future."""
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.utils.jwt_handler import verify_user_from_token
+from app.match.feed_cache import feed_cache
+from app.profile.fame_buffer import fame_buffer
+from app.match.relationship_service import relationship_cache
+from app.utils.pubsub import pubsub
+from app.utils.connections import connection_stats
+from app.chat.typing_service import typing_coalescer
+
+router = APIRouter()
+
+@router.get("/feed_cache")
+async def get_feed_cache_stats(request: Request):
+    """Compteurs du cache des fils de découverte (hits, misses, évictions...)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **feed_cache.stats()}
+
+@router.get("/fame_buffer")
+async def get_fame_buffer_stats(request: Request):
+    """Compteurs du tampon de fame rating (deltas en attente, écrits, durée d'écriture)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **fame_buffer.stats()}
+
+@router.get("/relationships")
+async def get_relationship_cache_stats(request: Request):
+    """Compteurs du cache des relations entre utilisateurs (hits, misses, requêtes...)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **relationship_cache.stats()}
+
+@router.get("/pubsub")
+async def get_pubsub_stats(request: Request):
+    """Compteurs du pub/sub entre workers (événements publiés, reçus, découpés...)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **pubsub.stats()}
+
+@router.get("/websockets")
+async def get_websocket_stats(request: Request):
+    """Compteurs des WebSockets de ce worker (profondeur des files d'envoi, pertes, déconnexions)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **connection_stats.stats()}
+
+@router.get("/typing")
+async def get_typing_stats(request: Request):
+    """Compteurs des indicateurs de frappe (signaux reçus, fusionnés, débuts et fins diffusés)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    return {"success": True, **typing_coalescer.stats()}
@@ -4,15 +4,41 @@ from fastapi.responses import JSONResponse
 from app.utils.jwt_handler import verify_user_from_token, verify_user_from_socket_token
 from app.notifications.notifications_service import (
     insert_notification,
+    insert_notifications,
     fetch_notifications,
-    mark_notifications_as_read,
-    can_send_notification
+    mark_notifications_as_read
 )
-from app.match.match_service import check_if_unliked
-import json
+from app.match.relationship_service import get_relationship
+from app.utils.pubsub import pubsub
+from app.utils.connections import Connection
+from app.routers import realtime
 
 router = APIRouter()
-notification_connections = {}
+# Connexions WebSocket de notifications de ce worker : user_id -> Connection
+notification_connections: dict[int, Connection] = {}
+
+async def deliver_notifications(data: dict):
+    """Met en file les notifications des destinataires connectés à ce worker."""
+    for item in data["items"]:
+        connection = notification_connections.get(item["receiver_id"])
+        if connection is not None:
+            connection.send_json(item["payload"])
+        realtime.deliver_to_user(item["receiver_id"], realtime.encode_frame("notification", item["payload"]))
+
+pubsub.subscribe("notifications", deliver_notifications)
+
+def notification_item(receiver_id, notif_id, notification_type, context, sender_id, timestamp) -> dict:
+    return {
+        "receiver_id": receiver_id,
+        "payload": {
+            "id": notif_id,
+            "type": notification_type,
+            "context": context,
+            "sender_id": sender_id,
+            "timestamp": str(timestamp),
+            "is_read": False
+        },
+    }
 
 @router.websocket("/ws/notifications")
 async def websocket_notifications(websocket: WebSocket):
@@ -31,17 +57,21 @@ async def websocket_notifications(websocket: WebSocket):
         return
     await websocket.accept()
     if user_id in notification_connections:
-        try:
-            await notification_connections[user_id].close()
-        except Exception:
-            pass
-    notification_connections[user_id] = websocket
+        await notification_connections[user_id].close()
+    connection = Connection(websocket, user_id)
+    connection.start()
+    notification_connections[user_id] = connection
 
     try:
         while True:
             await websocket.receive_text()
-    except WebSocketDisconnect:
-        notification_connections.pop(user_id, None)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await connection.close()
+        # Une nouvelle connexion du même utilisateur a pu remplacer celle-ci
+        if notification_connections.get(user_id) is connection:
+            del notification_connections[user_id]
 
 @router.get("/notifications")
 async def get_notifications(request: Request):
@@ -71,20 +101,28 @@ async def mark_read(request: Request, data: dict):
     return {"success": True, "message": "Notifications marked as read"}
 
 async def send_notification(receiver_id, sender_id, notification_type, context):
-    if not await can_send_notification(receiver_id, sender_id):
-        return
-
-    if await check_if_unliked(receiver_id, sender_id):
+    # Blocage (dans un sens ou dans l'autre) ou expéditeur unliké : pas de notification
+    relationship = await get_relationship(receiver_id, sender_id)
+    if relationship["blocked"] or relationship["unliked"]:
         return
 
     notif = await insert_notification(receiver_id, sender_id, notification_type, context)
-    if receiver_id in notification_connections:
-        ws = notification_connections[receiver_id]
-        await ws.send_text(json.dumps({
-            "id": notif[0],
-            "type": notification_type,
-            "context": context,
-            "sender_id": sender_id,
-            "timestamp": str(notif[1]),
-            "is_read": False
-        }))
\ No newline at end of file
+    # Livrée par le worker qui détient la WebSocket du destinataire
+    await pubsub.publish("notifications", {
+        "items": [notification_item(receiver_id, notif[0], notification_type, context, sender_id, notif[1])]
+    })
+
+async def send_notifications(notifications: list[dict]):
+    """
+    Version groupée de `send_notification` : insertion en une requête (les mêmes règles
+    de blocage et d'unlike sont appliquées en SQL), puis envoi aux destinataires connectés.
+    Chaque notification est un dict {receiver_id, sender_id, type, context}.
+    """
+    inserted = await insert_notifications(notifications)
+    if inserted:
+        await pubsub.publish("notifications", {
+            "items": [
+                notification_item(n.receiver_id, n.id, n.type, n.context, n.sender_id, n.timestamp)
+                for n in inserted
+            ]
+        })
@@ -4,12 +4,12 @@ from fastapi.responses import JSONResponse
 from app.profile.profile_service import get_profile_by_user_id, increment_fame_rating, upsert_profile
 from app.user.user_service import get_user_by_id, update_user_info, get_user_by_email, get_user_by_username
 from app.routers.notifications import send_notification
-from app.match.match_service import get_liked_user_ids, check_if_unliked, mutual_like_by_match
+from app.match.relationship_service import get_relationship
 from app.profile.block_service import block_user, is_user_blocked
 from app.profile.picture_service import get_pictures_of_user
-from app.profile.picture_service import get_main_picture_of_user
+from app.profile.picture_service import has_main_picture, get_main_thumbnail
 from app.profile.report_service import insert_report, count_reports_against_user, delete_user_by_id
-from app.utils.database import engine
+import asyncio
 import logging
 import re
 
@@ -45,6 +45,19 @@ async def get_profile(request: Request):
         "profile_pictures": profile_pictures
     }
 
+async def load_profile_view(requester_id: int, user_id: int):
+    """
+    Lectures (sans effet de bord) de la page profil, lancées en parallèle, chacune sur
+    sa connexion du pool : profil, utilisateur, relation, photos et droit de liker.
+    """
+    return await asyncio.gather(
+        get_profile_by_user_id(user_id),
+        get_user_by_id(user_id),
+        get_relationship(requester_id, user_id),  # like, unlike et match en une requête
+        get_pictures_of_user(user_id),
+        has_main_picture(requester_id),
+    )
+
 @router.get("/user/{user_id}")
 async def get_user_profile(user_id: int, request: Request):
     """Récupère le profil d'un utilisateur et vérifie s'il a déjà été liké."""
@@ -52,48 +65,50 @@ async def get_user_profile(user_id: int, request: Request):
     if isinstance(user_requesting, JSONResponse):
         return user_requesting
 
-    await increment_fame_rating(user_id)
+    requester_id = user_requesting["id"]
 
-    async with engine.begin() as conn:
-        profile_data = await get_profile_by_user_id(user_id)
-        user = await get_user_by_id(user_id)
-        if not profile_data:
-            return {"success": False, "detail": "Profile not found"}
+    profile_data, user, relationship, profile_pictures, can_like = await load_profile_view(requester_id, user_id)
+    if not profile_data:
+        return {"success": False, "detail": "Profile not found"}
 
-        liked_user_ids = await get_liked_user_ids(conn, user_requesting["id"])
-        is_liked = user_id in liked_user_ids
-
-        unlike = await check_if_unliked(user_requesting["id"], user_id)
+    await increment_fame_rating(user_id)
+    await send_notification(
+        receiver_id=user_id,
+        sender_id=requester_id,
+        notification_type="visite",
+        context=f"{user_requesting['username']} a visité votre profil."
+    )
 
-        profile_pictures = await get_pictures_of_user(user_id)
+    return {
+        "success": True,
+        "id": user_id,
+        "username": user["username"],
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "status": user["status"],
+        "laste_connexion": user["laste_connexion"],
+        "liked": relationship["likes"],
+        "unlike": relationship["unliked"],
+        "is_match": relationship["matched"],
+        **profile_data,
+        "can_like": can_like,
+        "profile_pictures": profile_pictures
+    }
 
-        has_main_picture = bool(await get_main_picture_of_user(user_requesting["id"]))
-        
-        is_match = await mutual_like_by_match(user_requesting["id"], user_id)
-
-        print(is_match)
-        await send_notification(
-            receiver_id=user_id,
-            sender_id=user_requesting["id"],
-            notification_type="visite",
-            context=f"{user_requesting['username']} a visité votre profil."
-        )
-
-        return {
-            "success": True,
-            "id": user_id,
-            "username": user["username"],
-            "first_name": user["first_name"],
-            "last_name": user["last_name"],
-            "status": user["status"],
-            "laste_connexion": user["laste_connexion"],
-            "liked": is_liked,
-            "unlike": unlike,
-            "is_match": is_match,
-            **profile_data,
-            "can_like": has_main_picture,
-            "profile_pictures": profile_pictures
-        }
+@router.get("/thumbnail/{user_id}")
+async def get_thumbnail(user_id: int, request: Request):
+    """Miniature de la photo principale (image JPEG, mise en cache par le navigateur)."""
+    user = await verify_user_from_token(request)
+    if isinstance(user, JSONResponse):
+        return user
+    thumbnail = await get_main_thumbnail(user_id)
+    if thumbnail is None:
+        return Response(status_code=404)
+    return Response(
+        content=thumbnail,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "private, max-age=300"},
+    )
 
 @router.post("/block")
 async def block(request: Request, data: dict):
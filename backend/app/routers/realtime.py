@@ -0,0 +1,143 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from app.utils.jwt_handler import verify_user_from_socket_token
+from app.chat.chat_service import get_conversation_users, mark_conversation_read
+from app.utils.connections import Connection
+from app.utils.pubsub import pubsub
+from app.chat.typing_service import typing_coalescer
+import json
+
+router = APIRouter()
+
+# Sockets multiplexées de ce worker : une par onglet, authentifiée une seule fois
+user_sockets: dict[int, set[Connection]] = {}
+conversation_subscribers: dict[int, set[Connection]] = {}
+
+def encode_frame(frame_type: str, data, conversation_id: int | None = None) -> str:
+    """
+    Trame typée envoyée au client : {type, conversation_id?, data}.
+    Types : message, typing, date_invite, date_result, video, notification,
+    read, subscribed, unsubscribed, pong, error.
+    """
+    frame = {"type": frame_type, "data": data}
+    if conversation_id is not None:
+        frame["conversation_id"] = conversation_id
+    return json.dumps(frame)
+
+def deliver_to_user(user_id: int, frame: str) -> None:
+    """Met une trame en file sur toutes les sockets multiplexées locales d'un utilisateur."""
+    for connection in list(user_sockets.get(user_id, ())):
+        connection.send(frame)
+
+def deliver_to_conversation(conversation_id: int, frame: str,
+                            user_ids: list[int] | None = None, exclude_user_id: int | None = None) -> None:
+    """Met une trame en file pour les sockets locales abonnées à la conversation."""
+    for connection in list(conversation_subscribers.get(conversation_id, ())):
+        if user_ids is not None and connection.user_id not in user_ids:
+            continue
+        if connection.user_id == exclude_user_id:
+            continue
+        connection.send(frame)
+
+def is_subscribed(user_id: int, conversation_id: int) -> bool:
+    """L'utilisateur a-t-il la conversation ouverte sur une socket multiplexée de ce worker ?"""
+    return any(c.user_id == user_id for c in conversation_subscribers.get(conversation_id, ()))
+
+async def subscribe(connection: Connection, subscriptions: set[int], conversation_id: int) -> None:
+    convo = await get_conversation_users(conversation_id)
+    if not convo or connection.user_id not in (convo.user1_id, convo.user2_id):
+        connection.send(encode_frame("error", {"detail": "Conversation introuvable"}, conversation_id))
+        return
+    subscriptions.add(conversation_id)
+    conversation_subscribers.setdefault(conversation_id, set()).add(connection)
+    connection.send(encode_frame("subscribed", None, conversation_id))
+
+def unsubscribe(connection: Connection, subscriptions: set[int], conversation_id: int) -> None:
+    subscriptions.discard(conversation_id)
+    subscribers = conversation_subscribers.get(conversation_id)
+    if subscribers is not None:
+        subscribers.discard(connection)
+        if not subscribers:
+            del conversation_subscribers[conversation_id]
+
+async def handle_frame(connection: Connection, user: dict, subscriptions: set[int], frame: dict) -> None:
+    """Traite une trame reçue du client."""
+    frame_type = frame.get("type")
+    conversation_id = frame.get("conversation_id")
+
+    if frame_type == "ping":
+        connection.send(encode_frame("pong", None))
+    elif frame_type == "subscribe" and isinstance(conversation_id, int):
+        await subscribe(connection, subscriptions, conversation_id)
+    elif frame_type == "unsubscribe" and isinstance(conversation_id, int):
+        unsubscribe(connection, subscriptions, conversation_id)
+        connection.send(encode_frame("unsubscribed", None, conversation_id))
+    elif frame_type == "typing" and conversation_id in subscriptions:
+        # {"type": "typing", "conversation_id": id, "typing": bool}, fusionné côté serveur
+        await typing_coalescer.update(connection.user_id, user["username"], conversation_id, bool(frame.get("typing")))
+    elif frame_type == "read" and isinstance(conversation_id, int) and isinstance(frame.get("message_id"), int):
+        # {"type": "read", "conversation_id": id, "message_id": id} : lu jusqu'à message_id inclus
+        state = await mark_conversation_read(conversation_id, connection.user_id, frame["message_id"])
+        if state is None:
+            connection.send(encode_frame("error", {"detail": "Conversation introuvable"}, conversation_id))
+        else:
+            connection.send(encode_frame("read", state, conversation_id))
+    elif frame_type == "video" and conversation_id in subscriptions:
+        # Relayé tel quel à l'autre participant (même événement que /chat/ws/video)
+        await pubsub.publish("video", {
+            "conversation_id": conversation_id,
+            "sender_id": connection.user_id,
+            "raw": json.dumps(frame.get("data")),
+        })
+    else:
+        connection.send(encode_frame("error", {"detail": f"Trame invalide : {frame_type}"}, conversation_id))
+
+@router.websocket("/ws")
+async def realtime_websocket(websocket: WebSocket):
+    """
+    Socket unique par utilisateur (par onglet) : messages, frappe, invitations,
+    signalisation vidéo et notifications y transitent sous forme de trames typées.
+    Le client s'abonne aux conversations ouvertes avec {"type": "subscribe", "conversation_id": id}.
+    """
+    token = websocket.cookies.get("access_token")
+    if not token:
+        await websocket.close(code=1008)
+        return
+    try:
+        user = await verify_user_from_socket_token(token)
+    except JWTError:
+        await websocket.close(code=1008)
+        return
+    # Token invalide, utilisateur introuvable ou hors ligne : réponse d'erreur au lieu d'un utilisateur
+    if isinstance(user, JSONResponse):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    user_id = user["id"]
+    connection = Connection(websocket, user_id)
+    connection.start()
+    user_sockets.setdefault(user_id, set()).add(connection)
+    subscriptions: set[int] = set()
+
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                frame = json.loads(raw)
+            except json.JSONDecodeError:
+                connection.send(encode_frame("error", {"detail": "JSON invalide"}))
+                continue
+            if isinstance(frame, dict):
+                await handle_frame(connection, user, subscriptions, frame)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await connection.close()
+        for conversation_id in list(subscriptions):
+            unsubscribe(connection, subscriptions, conversation_id)
+        sockets = user_sockets.get(user_id)
+        if sockets is not None:
+            sockets.discard(connection)
+            if not sockets:
+                del user_sockets[user_id]
@@ -3,6 +3,7 @@ from app.utils.jwt_handler import verify_user_from_token
 from app.utils.database import engine
 from fastapi.responses import JSONResponse
 from app.profile.location_service import update_location, get_all_inf_location_of_user
+from app.match.cache_invalidation import invalidate_caches
 from app.profile.block_service import get_blocked_users, unblock_users
 from app.profile.picture_service import count_user_pictures, insert_picture, get_pictures_of_user, delete_user_pictures_by_ids, set_main_picture, process_image
 
@@ -50,6 +51,8 @@ async def update_user_location(request: Request, new_location: dict):
             location_method=new_location["locationMethod"],
             map_enabled=new_location["mapEnabled"]
         )
+    # Après validation de la transaction, pour que les autres workers relisent la nouvelle position
+    await invalidate_caches(feeds=[user_id])
 
     return {"success": True, "message": "Location updated successfully"}
 
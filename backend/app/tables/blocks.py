@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey, MetaData, DateTime, func, UniqueConstraint
+from sqlalchemy import Table, Column, Integer, ForeignKey, MetaData, DateTime, func, UniqueConstraint, Index
 from sqlalchemy.sql import text
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 
@@ -11,5 +11,7 @@ blocks_table = Table(
     Column("blocked_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
     # Column("created_at", DateTime, server_default=func.now(), nullable=False),
     Column("created_at", TIMESTAMP(timezone=True), server_default=text("NOW()"), nullable=False),
-    UniqueConstraint("blocker_id", "blocked_id", name="uq_blocker_blocked")
+    UniqueConstraint("blocker_id", "blocked_id", name="uq_blocker_blocked"),
+    # uq_blocker_blocked couvre les recherches par blocker_id, cet index celles par blocked_id
+    Index("idx_blocks_blocked_id", "blocked_id")
 )
\ No newline at end of file
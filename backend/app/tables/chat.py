@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, DateTime, Text, Boolean, JSON, UniqueConstraint
+from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, DateTime, Text, Boolean, JSON, UniqueConstraint, Index
 from datetime import datetime
 from sqlalchemy.sql import text
 from sqlalchemy.dialects.postgresql import TIMESTAMP
@@ -12,6 +12,9 @@ conversations_table = Table(
     Column("user2_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
     # Column("created_at", DateTime, default=datetime.utcnow, nullable=False),
     Column("created_at", TIMESTAMP(timezone=True), server_default=text("NOW()"), nullable=False),
+    # Liste des conversations d'un utilisateur (il peut être user1 ou user2)
+    Index("idx_conversations_user1_id", "user1_id"),
+    Index("idx_conversations_user2_id", "user2_id"),
 )
 
 messages_table = Table(
@@ -24,6 +27,19 @@ messages_table = Table(
     # Column("timestamp", DateTime, default=datetime.utcnow, nullable=False),
     Column("is_read", Boolean, default=False),
     Column("type", String, nullable=False, server_default="message"),
+    # Historique paginé par id dans une conversation
+    Index("idx_messages_conversation_id", "conversation_id", "id"),
+)
+
+# Filigrane de lecture par (conversation, utilisateur) : dernier message lu et compteur
+# de non lus tenu à jour par insert_message (plus de comptage sur messages à la lecture)
+conversation_reads_table = Table(
+    "conversation_reads", metadata,
+    Column("conversation_id", Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("last_read_message_id", Integer, nullable=False, server_default="0"),
+    Column("unread_count", Integer, nullable=False, server_default="0"),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=text("NOW()"), nullable=False),
 )
 
 date_invites_table = Table(
@@ -1,7 +1,10 @@
-from sqlalchemy import Table, Column, Integer, Float, String, ForeignKey, DateTime, func, MetaData, Boolean
+from sqlalchemy import Table, Column, Integer, Float, String, ForeignKey, DateTime, func, MetaData, Boolean, Index
 
 metadata = MetaData()
 
+# Taille (en degrés) d'une cellule de la grille spatiale (~55 km en latitude)
+GRID_CELL_DEGREES = 0.5
+
 locations_table = Table(
     "locations", metadata,
     Column("id", Integer, primary_key=True),
@@ -12,5 +15,9 @@ locations_table = Table(
     Column("country", String, nullable=True),
     Column("location_method", String, nullable=False, default="IP"),
     Column("map_enabled", Boolean, default=False, nullable=False),
-    Column("last_updated", DateTime, default=func.now(), onupdate=func.now())
+    Column("last_updated", DateTime, default=func.now(), onupdate=func.now()),
+    # Cellule de grille (floor(coord / GRID_CELL_DEGREES)), maintenue par location_service
+    Column("grid_lat", Integer, nullable=True),
+    Column("grid_lon", Integer, nullable=True),
+    Index("idx_locations_grid", "grid_lat", "grid_lon")
 )
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, Date
+from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, Date, Index, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import ARRAY
 
 metadata = MetaData()
 
@@ -12,5 +13,12 @@ profiles_table = Table(
     Column("interests", String, nullable=True),  # Stockez les tags sous forme de chaîne JSON
     Column("birthday", Date, nullable=True),
     Column("fame_rating", Integer, nullable=False, default=0),
+    # Date de la valeur stockée : le fame rating courant en décroît (voir fame_decay)
+    Column("fame_updated_at", TIMESTAMP(timezone=True), server_default=text("NOW()"), nullable=False),
+    Column("tag_ids", ARRAY(Integer), nullable=True),  # Ids (table tags) des intérêts, maintenus par upsert_profile
     # Column("profile_pictures", String, nullable=True),  # Stockez les chemins des images
+    Index("idx_profiles_gender_pref", "gender", "sexual_preferences"),
+    Index("idx_profiles_birthday", "birthday"),
+    Index("idx_profiles_fame_rating", "fame_rating"),
+    Index("idx_profiles_tag_ids", "tag_ids", postgresql_using="gin"),
 )
\ No newline at end of file
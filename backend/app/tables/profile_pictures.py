@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, LargeBinary, Boolean
+from sqlalchemy import Table, Column, Integer, String, ForeignKey, MetaData, LargeBinary, Boolean, Index
+from sqlalchemy.sql import text
 # from datetime import datetime
 
 metadata = MetaData()
@@ -9,5 +10,9 @@ profile_pictures_table = Table(
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),  # Référence au profil
     Column("image_data", LargeBinary, nullable=False),  # Données binaires de l'image
     Column("is_profile_picture", Boolean, default=False, nullable=False),  # Indique si c'est la photo de profil
+    Column("thumbnail_data", LargeBinary, nullable=True),  # Miniature pour les listes, générée à l'upload
     # Column("created_at", DateTime, default=datetime.utcnow, nullable=False)  # Timestamp pour suivi
+    Index("idx_profile_pictures_main", "user_id", postgresql_where=text("is_profile_picture")),
+    # Photos sans miniature (backfill), vide une fois le rattrapage terminé
+    Index("idx_profile_pictures_missing_thumbnail", "id", postgresql_where=text("thumbnail_data IS NULL")),
 )
\ No newline at end of file
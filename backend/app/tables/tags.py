@@ -0,0 +1,10 @@
+from sqlalchemy import Table, Column, Integer, String, MetaData
+
+metadata = MetaData()
+
+# Dictionnaire des tags d'intérêt (nom normalisé -> id entier)
+tags_table = Table(
+    "tags", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+)
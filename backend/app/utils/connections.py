@@ -0,0 +1,122 @@
+from fastapi import WebSocket
+from app.config import settings
+import asyncio
+import json
+
+WS_SEND_QUEUE_SIZE = 256  # Messages en attente max par connexion
+WS_SEND_TIMEOUT_SECONDS = 10  # Au-delà, le client est considéré comme mort
+SLOW_CONSUMER_POLICIES = ("drop", "disconnect")
+SLOW_CONSUMER_CLOSE_CODE = 1013  # « Try Again Later » : le client peut se reconnecter
+
+class Connection:
+    """
+    WebSocket côté serveur avec une file d'envoi bornée et sa propre tâche d'écriture.
+    `send` met le message en file sans jamais attendre le client : un client lent ou
+    à moitié mort ne bloque plus la requête qui diffuse l'événement.
+    Quand la file est pleine, la politique `slow_consumer_policy` s'applique :
+    "drop" ignore le message, "disconnect" ferme la connexion (le client se reconnecte
+    et rattrape l'historique).
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int,
+                 max_queue: int = WS_SEND_QUEUE_SIZE, policy: str | None = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.policy = policy or settings.ws_slow_consumer_policy
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Politique de client lent inconnue : {self.policy}")
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self._writer: asyncio.Task | None = None
+        self._closing = False
+        self.closed = False
+
+    def start(self) -> None:
+        """Démarre la tâche d'écriture (après `websocket.accept()`)."""
+        if self._writer is None:
+            connection_stats.opened(self)
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, message: str) -> bool:
+        """Met un message texte en file. Retourne False s'il n'a pas été accepté."""
+        if self.closed or self._closing:
+            return False
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            connection_stats.dropped += 1
+            if self.policy == "disconnect":
+                print(f"⚠️ Client lent déconnecté (user {self.user_id})")
+                connection_stats.slow_disconnects += 1
+                self._closing = True
+                asyncio.create_task(self.close(SLOW_CONSUMER_CLOSE_CODE))
+            return False
+        connection_stats.max_queue_depth = max(connection_stats.max_queue_depth, self._queue.qsize())
+        return True
+
+    def send_json(self, payload: dict) -> bool:
+        return self.send(json.dumps(payload))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                message = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message), WS_SEND_TIMEOUT_SECONDS)
+                connection_stats.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Timeout ou socket fermée : la connexion est abandonnée
+            connection_stats.send_errors += 1
+            print(f"⚠️ Impossible d’envoyer à {self.user_id} : {e}")
+            asyncio.create_task(self.close())
+
+    async def close(self, code: int = 1000) -> None:
+        """Arrête l'écriture et ferme la WebSocket (sans effet si déjà fermée)."""
+        if self.closed:
+            return
+        self.closed = True
+        connection_stats.closed(self)
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # Déjà fermée par le client
+
+class ConnectionStats:
+    """Compteurs des connexions WebSocket de ce worker (files d'envoi, pertes, déconnexions)."""
+
+    def __init__(self):
+        self._connections: set[Connection] = set()
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        self.max_queue_depth = 0
+
+    def opened(self, connection: Connection) -> None:
+        self._connections.add(connection)
+
+    def closed(self, connection: Connection) -> None:
+        self._connections.discard(connection)
+
+    def stats(self) -> dict:
+        depths = [c.queue_depth for c in self._connections]
+        return {
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "current_max_queue_depth": max(depths, default=0),
+            "max_queue_depth": self.max_queue_depth,
+            "queue_size": WS_SEND_QUEUE_SIZE,
+            "policy": settings.ws_slow_consumer_policy,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors,
+        }
+
+connection_stats = ConnectionStats()
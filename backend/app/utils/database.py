@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import MetaData
+from sqlalchemy.sql import text
 from app.tables.users import metadata as users_metadata
 from app.tables.chat import metadata as chat_metadata
 from app.tables.likes import metadata as like_metadata
@@ -13,6 +14,8 @@ from app.tables.blocks import metadata as blocks_metadata
 from app.tables.reports import metadata as reports_metadata
 from app.tables.oauth_account import metadata as oauth_accounts_metadata
 from app.tables.email_verification import metadata as email_verification_metadata
+from app.tables.tags import metadata as tags_metadata
+from app.tables.locations import GRID_CELL_DEGREES
 from dotenv import load_dotenv
 import os
 
@@ -33,7 +36,8 @@ def build_database_url():
 DATABASE_URL = build_database_url()
 
 # Crée un moteur asynchrone
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Pool dimensionné pour les lectures concurrentes (asyncio.gather) des handlers
+engine = create_async_engine(DATABASE_URL, echo=True, pool_size=10, max_overflow=20)
 
 # Crée une session asynchrone
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
@@ -87,6 +91,63 @@ for table in oauth_accounts_metadata.tables.values():
 for table in email_verification_metadata.tables.values():
     table.tometadata(combined_metadata)
 
+# Ajoute les tables des métadonnées des tags
+for table in tags_metadata.tables.values():
+    table.tometadata(combined_metadata)
+
+# Migrations idempotentes pour les bases déjà existantes
+# (create_all ne crée que les tables manquantes, pas les nouvelles colonnes/index)
+MIGRATIONS = [
+    # Grille spatiale sur locations
+    "ALTER TABLE locations ADD COLUMN IF NOT EXISTS grid_lat INTEGER",
+    "ALTER TABLE locations ADD COLUMN IF NOT EXISTS grid_lon INTEGER",
+    "CREATE INDEX IF NOT EXISTS idx_locations_grid ON locations (grid_lat, grid_lon)",
+    f"""
+    UPDATE locations
+    SET grid_lat = FLOOR(latitude / {GRID_CELL_DEGREES})::int,
+        grid_lon = FLOOR(longitude / {GRID_CELL_DEGREES})::int
+    WHERE grid_lat IS NULL OR grid_lon IS NULL
+    """,
+    # Index des filtres de recherche (orientation, âge, célébrité)
+    "CREATE INDEX IF NOT EXISTS idx_profiles_gender_pref ON profiles (gender, sexual_preferences)",
+    "CREATE INDEX IF NOT EXISTS idx_profiles_birthday ON profiles (birthday)",
+    "CREATE INDEX IF NOT EXISTS idx_profiles_fame_rating ON profiles (fame_rating)",
+    # Tags normalisés (la conversion des intérêts JSON existants est faite par tag_service)
+    "ALTER TABLE profiles ADD COLUMN IF NOT EXISTS tag_ids INTEGER[]",
+    "CREATE INDEX IF NOT EXISTS idx_profiles_tag_ids ON profiles USING GIN (tag_ids)",
+    # Recherche des blocages dans les deux sens
+    "CREATE INDEX IF NOT EXISTS idx_blocks_blocked_id ON blocks (blocked_id)",
+    # Fame rating daté (décroissance calculée à la lecture, plus de remise à zéro nocturne)
+    "ALTER TABLE profiles ADD COLUMN IF NOT EXISTS fame_updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()",
+    # Liste des conversations d'un utilisateur et pagination de l'historique
+    "CREATE INDEX IF NOT EXISTS idx_conversations_user1_id ON conversations (user1_id)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_user2_id ON conversations (user2_id)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_id, id)",
+    # Miniatures des photos (remplies à l'upload, ou par backfill_thumbnails)
+    "ALTER TABLE profile_pictures ADD COLUMN IF NOT EXISTS thumbnail_data BYTEA",
+    "CREATE INDEX IF NOT EXISTS idx_profile_pictures_main ON profile_pictures (user_id) WHERE is_profile_picture",
+    "CREATE INDEX IF NOT EXISTS idx_profile_pictures_missing_thumbnail ON profile_pictures (id) WHERE thumbnail_data IS NULL",
+    # Filigranes de lecture : initialisés depuis messages.is_read pour les conversations existantes
+    """
+    INSERT INTO conversation_reads (conversation_id, user_id, unread_count)
+    SELECT c.id, participant.user_id, (
+        SELECT COUNT(*) FROM messages m
+        WHERE m.conversation_id = c.id
+          AND m.sender_id IS DISTINCT FROM participant.user_id
+          AND m.is_read IS NOT TRUE
+    )
+    FROM conversations c
+    CROSS JOIN LATERAL (VALUES (c.user1_id), (c.user2_id)) AS participant(user_id)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM conversation_reads r
+        WHERE r.conversation_id = c.id AND r.user_id = participant.user_id
+    )
+    ON CONFLICT DO NOTHING
+    """,
+]
+
 async def create_tables():
     async with engine.begin() as conn:
-        await conn.run_sync(combined_metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(combined_metadata.create_all)
+        for migration in MIGRATIONS:
+            await conn.execute(text(migration))
\ No newline at end of file
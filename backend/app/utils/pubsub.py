@@ -0,0 +1,179 @@
+from sqlalchemy.sql import text
+from app.utils.database import engine, build_database_url
+import asyncio
+import asyncpg
+import json
+import os
+import time
+import uuid
+
+# Canal Postgres partagé par tous les workers uvicorn
+PUBSUB_CHANNEL = "matcha_events"
+# Postgres refuse les payloads NOTIFY de 8000 octets ou plus : au-delà de cette taille
+# (marge pour l'enveloppe), un événement est découpé en morceaux reconstitués à la réception.
+MAX_NOTIFY_PAYLOAD_BYTES = 7000
+CHUNK_REASSEMBLY_TIMEOUT_SECONDS = 30
+RECONNECT_DELAY_SECONDS = 2
+
+# Identifiant du process, pour les métriques et les logs
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+def listen_dsn() -> str:
+    """DSN asyncpg brut (sans le suffixe SQLAlchemy « +asyncpg »)."""
+    return build_database_url().replace("+asyncpg", "")
+
+def split_payload(payload: str, max_bytes: int = MAX_NOTIFY_PAYLOAD_BYTES) -> list[str]:
+    """Découpe un payload trop gros en enveloppes {chunk: id, index, count, part}."""
+    if len(payload.encode("utf-8")) <= max_bytes:
+        return [payload]
+    # Le JSON de l'événement est en ASCII (json.dumps par défaut) : un caractère prend
+    # au plus 2 octets une fois ré-échappé dans l'enveloppe, d'où une marge confortable.
+    step = max_bytes // 4
+    parts = [payload[i:i + step] for i in range(0, len(payload), step)]
+    chunk_id = uuid.uuid4().hex
+    return [
+        json.dumps({"chunk": chunk_id, "index": index, "count": len(parts), "part": part})
+        for index, part in enumerate(parts)
+    ]
+
+class PubSub:
+    """
+    Diffusion d'événements entre workers via Postgres LISTEN/NOTIFY (sans service externe).
+    Chaque worker écoute le canal sur une connexion asyncpg dédiée et transmet les
+    événements reçus aux handlers enregistrés avec `subscribe`, qui les livrent aux
+    WebSockets qu'il détient. Un événement publié est donc reçu par tous les workers,
+    y compris celui qui l'a publié.
+    Si l'écoute n'est pas active (démarrage, reconnexion), les événements sont livrés
+    localement pour ne pas bloquer un déploiement à un seul worker.
+    """
+
+    def __init__(self, channel: str = PUBSUB_CHANNEL):
+        self.channel = channel
+        self._handlers: dict[str, list] = {}
+        self._conn: asyncpg.Connection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._chunks: dict[str, tuple[float, dict[int, str]]] = {}
+        self._stopping = False
+        self.published = 0
+        self.received = 0
+        self.chunked = 0
+        self.local_deliveries = 0
+        self.handler_errors = 0
+        self.reconnects = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    def subscribe(self, event_type: str, handler) -> None:
+        """Enregistre un handler async(data: dict) pour un type d'événement."""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def publish(self, event_type: str, data: dict) -> None:
+        """Publie un événement à tous les workers (dans une seule transaction, morceaux compris)."""
+        event = {"type": event_type, "data": data, "origin": WORKER_ID}
+        if not self.listening:
+            self.local_deliveries += 1
+            await self._dispatch(event)
+            return
+
+        payloads = split_payload(json.dumps(event, default=str))
+        if len(payloads) > 1:
+            self.chunked += 1
+        async with engine.begin() as conn:
+            for payload in payloads:
+                await conn.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": self.channel, "payload": payload}
+                )
+        self.published += 1
+
+    async def start(self) -> None:
+        """Ouvre la connexion d'écoute (au démarrage de l'application)."""
+        self._stopping = False
+        try:
+            await self._connect()
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"❌ Pub/sub indisponible, nouvelle tentative : {e}")
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        """Ferme la connexion d'écoute (à l'arrêt de l'application)."""
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+    async def _connect(self) -> None:
+        conn = await asyncpg.connect(listen_dsn())
+        conn.add_termination_listener(self._on_terminated)
+        await conn.add_listener(self.channel, self._on_notify)
+        self._conn = conn
+
+    def _on_terminated(self, conn) -> None:
+        self._conn = None
+        if not self._stopping:
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._stopping and not self.listening:
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            try:
+                await self._connect()
+                self.reconnects += 1
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"❌ Reconnexion pub/sub échouée : {e}")
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        message = json.loads(payload)
+        if "chunk" in message:
+            message = self._reassemble(message)
+            if message is None:
+                return
+        self.received += 1
+        asyncio.create_task(self._dispatch(message))
+
+    def _reassemble(self, chunk: dict) -> dict | None:
+        """Stocke un morceau ; retourne l'événement complet une fois tous les morceaux reçus."""
+        now = time.monotonic()
+        # Morceaux orphelins (publication interrompue) oubliés après un délai
+        for chunk_id in [k for k, (expires, _) in self._chunks.items() if expires < now]:
+            del self._chunks[chunk_id]
+
+        _, parts = self._chunks.setdefault(chunk["chunk"], (now + CHUNK_REASSEMBLY_TIMEOUT_SECONDS, {}))
+        parts[chunk["index"]] = chunk["part"]
+        if len(parts) < chunk["count"]:
+            return None
+        del self._chunks[chunk["chunk"]]
+        return json.loads("".join(parts[i] for i in range(chunk["count"])))
+
+    async def _dispatch(self, event: dict) -> None:
+        for handler in self._handlers.get(event["type"], []):
+            try:
+                await handler(event["data"])
+            except Exception as e:
+                self.handler_errors += 1
+                print(f"⚠️ Erreur du handler pub/sub {event['type']} : {e}")
+
+    def stats(self) -> dict:
+        """Compteurs exposés pour suivre la diffusion entre workers."""
+        return {
+            "worker_id": WORKER_ID,
+            "listening": self.listening,
+            "published": self.published,
+            "received": self.received,
+            "chunked": self.chunked,
+            "local_deliveries": self.local_deliveries,
+            "handler_errors": self.handler_errors,
+            "reconnects": self.reconnects,
+            "pending_chunks": len(self._chunks),
+        }
+
+pubsub = PubSub()
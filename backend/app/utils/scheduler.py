@@ -1,19 +1,19 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from app.profile.profile_service import reset_fame_ratings
 from app.user.user_service import mark_users_offline_if_needed, cleanup_unverified_accounts, cleanup_expired_reset_codes
+from app.profile.picture_service import backfill_thumbnails
 
 
 scheduler = AsyncIOScheduler()
+BACKFILL_THUMBNAILS_JOB_ID = "backfill_thumbnails"
+
+async def run_thumbnail_backfill():
+    """Un lot de miniatures ; la tâche est retirée dès qu'il n'y a plus rien à traiter."""
+    if await backfill_thumbnails() == 0:
+        scheduler.remove_job(BACKFILL_THUMBNAILS_JOB_ID)
 
 def start_scheduler():
-    # Reset du fame rating tous les jours à minuit
-    scheduler.add_job(
-        reset_fame_ratings,
-        CronTrigger(hour=0, minute=0),
-        name="Reset fame rating every day at midnight",
-        replace_existing=True,
-    )
+    # Le fame rating n'est plus remis à zéro chaque nuit : il décroît à la lecture (fame_decay)
 
     # Vérification des utilisateurs inactifs toutes les 5 minutes
     scheduler.add_job(
@@ -36,5 +36,12 @@ def start_scheduler():
         name="Delete password reset after 10 min",
         replace_existing=True,
     )
+    scheduler.add_job(
+        run_thumbnail_backfill,
+        CronTrigger(minute="*"),  # Toutes les minutes, par lots, jusqu'à la fin du rattrapage
+        id=BACKFILL_THUMBNAILS_JOB_ID,
+        name="Generate missing picture thumbnails",
+        replace_existing=True,
+    )
     scheduler.start()
     # print("✅ Tâches planifiées activées (APS)")
\ No newline at end of file
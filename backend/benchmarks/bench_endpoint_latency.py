@@ -0,0 +1,104 @@
+"""
+Mesure de latence (p50 / p95 / moyenne) des lectures du fil de découverte et de la
+page profil, en parallèle (asyncio.gather, code actuel) et en séquentiel (avant).
+
+Le benchmark appelle directement le code des handlers, dans le process :
+- le fil est recalculé par `compute_feed` à chaque itération (le cache des fils
+  n'est jamais consulté, on mesure bien les requêtes et non des hits de cache) ;
+- la page profil est mesurée via `load_profile_view`, sans l'incrément de fame
+  rating ni la notification de visite (aucun effet de bord), avec le cache des
+  relations vidé avant chaque itération.
+
+A lancer depuis le conteneur backend, sur une base peuplée (make insert_synthetic) :
+
+    docker exec -it backend python -m benchmarks.bench_endpoint_latency --users 20 --requests 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from sqlalchemy.sql import text
+from app.utils.database import engine
+from app.match.match_service import get_discovery_context, fetch_matching_profiles, enrich_profiles
+from app.match.ranking_engine import apply_scores
+from app.match.relationship_service import relationship_cache, get_relationship
+from app.profile.block_service import get_blocked_user_ids
+from app.profile.profile_service import get_profile_by_user_id
+from app.profile.picture_service import get_pictures_of_user, has_main_picture
+from app.user.user_service import get_user_by_id
+from app.routers.match import compute_feed
+from app.routers.profile import load_profile_view
+
+async def compute_feed_sequential(user_id):
+    """`compute_feed` avant la mise en parallèle : candidats puis blocages."""
+    context = await get_discovery_context(user_id)
+    profiles = await fetch_matching_profiles(user_id, context["gender"], context["sexual_preferences"])
+    blocked_ids = await get_blocked_user_ids(user_id)
+    profiles = await enrich_profiles(
+        context["latitude"], context["longitude"], context["liked_ids"],
+        profiles, include_coords=context["map_enabled"]
+    )
+    profiles = [profile for profile in profiles if profile["id"] not in blocked_ids]
+    apply_scores(profiles, context)
+    return profiles
+
+async def load_profile_view_sequential(requester_id, user_id):
+    """`load_profile_view` avant la mise en parallèle : une lecture après l'autre."""
+    return (
+        await get_profile_by_user_id(user_id),
+        await get_user_by_id(user_id),
+        await get_relationship(requester_id, user_id),
+        await get_pictures_of_user(user_id),
+        await has_main_picture(requester_id),
+    )
+
+async def measure(call, pairs, count):
+    """Exécute `call(*pair)` sur les paires, `count` tours, et retourne les durées en ms."""
+    durations = []
+    for _ in range(count):
+        for pair in pairs:
+            relationship_cache.invalidate(*pair)
+            start = time.perf_counter()
+            await call(*pair)
+            durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+def summarize(durations: list[float]) -> str:
+    ordered = sorted(durations)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {p50:7.1f} ms | p95 {p95:7.1f} ms | moyenne {statistics.mean(ordered):7.1f} ms"
+
+async def pick_users(count):
+    """Utilisateurs localisés (et un profil à consulter pour chacun)."""
+    async with engine.begin() as conn:
+        result = await conn.execute(text("""
+            SELECT l.user_id FROM locations l JOIN profiles p ON p.user_id = l.user_id
+            ORDER BY l.user_id LIMIT :count
+        """), {"count": count * 2})
+        ids = [row.user_id for row in result.fetchall()]
+    return list(zip(ids[::2], ids[1::2]))
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="utilisateurs (et profils consultés) mesurés")
+    parser.add_argument("--requests", type=int, default=20, help="tours de mesure")
+    args = parser.parse_args()
+
+    engine.echo = False
+    pairs = await pick_users(args.users)
+    viewers = [(viewer,) for viewer, _ in pairs]
+
+    benchmarks = [
+        ("fil de découverte (séquentiel)", compute_feed_sequential, viewers),
+        ("fil de découverte (parallèle)", compute_feed, viewers),
+        ("page profil (séquentiel)", load_profile_view_sequential, pairs),
+        ("page profil (parallèle)", load_profile_view, pairs),
+    ]
+    for name, call, arguments in benchmarks:
+        await measure(call, arguments, 1)  # échauffement (pool, plans)
+        print(f"{name:<35} {summarize(await measure(call, arguments, args.requests))}")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Benchmark : haversine scalaire (boucle Python) vs haversine_batch (NumPy).
+
+A lancer depuis le conteneur backend (les variables POSTGRES_* doivent être
+définies car location_service importe le moteur SQLAlchemy) :
+
+    docker exec -it backend python -m benchmarks.bench_haversine
+"""
+import random
+import time
+import numpy as np
+from app.profile.location_service import haversine, haversine_batch
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEAT = 3
+
+def best_of(func, repeat=REPEAT):
+    """Retourne le meilleur temps (en secondes) sur plusieurs exécutions."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rng = random.Random(42)
+    user_lat, user_lon = 48.8566, 2.3522  # Paris
+
+    print(f"{'candidats':>10} | {'scalaire (s)':>12} | {'batch (s)':>10} | {'gain':>7}")
+    print("-" * 50)
+    for size in SIZES:
+        lats = [rng.uniform(-90, 90) for _ in range(size)]
+        lons = [rng.uniform(-180, 180) for _ in range(size)]
+        lats_np = np.array(lats)
+        lons_np = np.array(lons)
+
+        scalar = best_of(lambda: [haversine(user_lat, user_lon, la, lo) for la, lo in zip(lats, lons)])
+        batch = best_of(lambda: haversine_batch(user_lat, user_lon, lats_np, lons_np))
+
+        # Les deux implémentations doivent donner le même résultat
+        expected = np.array([haversine(user_lat, user_lon, la, lo) for la, lo in zip(lats[:1000], lons[:1000])])
+        assert np.allclose(expected, haversine_batch(user_lat, user_lon, lats_np[:1000], lons_np[:1000]))
+
+        print(f"{size:>10} | {scalar:>12.4f} | {batch:>10.4f} | {scalar / batch:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark : tri complet vs sélection top-K (tas borné) dans sort_profiles.
+
+A lancer depuis le conteneur backend (les variables POSTGRES_* doivent être
+définies car match_service importe le moteur SQLAlchemy) :
+
+    docker exec -it backend python -m benchmarks.bench_top_k
+"""
+import asyncio
+import random
+import time
+from app.match.match_service import sort_profiles
+
+CANDIDATES = 100_000
+K = 50
+REPEAT = 5
+
+def make_profiles(size, rng):
+    """Profils enrichis synthétiques (environ 1 % sans distance)."""
+    return [
+        {
+            "id": i,
+            "distance_km": None if rng.random() < 0.01 else rng.randint(0, 20000),
+            "common_tags": rng.randint(0, 10),
+            "fame_rating": rng.randint(0, 50),
+        }
+        for i in range(size)
+    ]
+
+async def best_of(coro_factory, repeat=REPEAT):
+    """Retourne le meilleur temps (en secondes) et le dernier résultat."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await coro_factory()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+async def main():
+    profiles = make_profiles(CANDIDATES, random.Random(42))
+
+    full_time, full = await best_of(lambda: sort_profiles(profiles))
+    top_time, top = await best_of(lambda: sort_profiles(profiles, limit=K))
+
+    # La sélection top-K doit donner exactement le début du tri complet
+    assert [p["id"] for p in top] == [p["id"] for p in full[:K]]
+
+    print(f"{CANDIDATES} candidats, K={K}")
+    print(f"tri complet : {full_time * 1000:.1f} ms")
+    print(f"top-K       : {top_time * 1000:.1f} ms")
+    print(f"gain        : {full_time / top_time:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
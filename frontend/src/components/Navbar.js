@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useRef } from "react";
+import React, { useEffect, useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { useAuth } from "../context/AuthContext";
 import { secureApiCall } from "../utils/api";
@@ -11,6 +11,7 @@ import {
   Bars3Icon,
 } from "@heroicons/react/24/solid";
 import { showErrorToast } from "../utils/showErrorToast";
+import { openRealtimeSocket, closeRealtimeSocket, onFrame } from "../utils/realtimeSocket";
 
 const Navbar = () => {
   const { isLoggedIn, userId, logout } = useAuth();
@@ -18,8 +19,6 @@ const Navbar = () => {
   const [isSettingsDropdownOpen, setIsSettingsDropdownOpen] = useState(false);
   const [unreadCount, setUnreadCount] = useState(0);
   const [isMobileMenuOpen, setIsMobileMenuOpen] = useState(false);
-  const socket = useRef(null);
-  const connectedUserId = useRef(null);
   const navigate = useNavigate();
 
   const sendPing = async () => {
@@ -31,61 +30,18 @@ const Navbar = () => {
     }
   };
 
-  //  Connexion WebSocket pour écouter les nouvelles notifications
+  //  Socket temps réel (partagée avec le chat) : écoute des nouvelles notifications
   useEffect(() => {
     if (!isLoggedIn || !userId) return;
-  
-    const isSocketOpen = socket.current && socket.current.readyState === WebSocket.OPEN;
-  
-    // Si la socket est déjà connectée pour ce user et toujours ouverte, on ne fait rien
-    if (isSocketOpen && connectedUserId.current === userId) {
-      // console.log("⚠️ WebSocket déjà connectée pour cet utilisateur");
-      return;
-    }
-  
-    // console.log("🧠 Ouverture d'une nouvelle WebSocket pour user:", userId);
-  
-    // Si une ancienne socket existe, on la ferme proprement
-    if (socket.current) {
-      // console.log("🔌 Fermeture de l'ancienne socket...");
-      socket.current.close();
-      socket.current = null;
-      connectedUserId.current = null;
-    }
-  
-    // Création d'une nouvelle socket
-    const newSocket = new WebSocket(`wss://${window.location.host}/notifications/ws/notifications`);
-    socket.current = newSocket;
-    connectedUserId.current = userId;
-  
-    newSocket.onopen = () => {
-      // console.log("✅ WebSocket connectée !");
-    };
-  
-    newSocket.onmessage = (event) => {
-      // console.log("📩 Notification reçue :", event.data);
+
+    openRealtimeSocket();
+    const removeListener = onFrame("notification", () => {
       setUnreadCount((prev) => prev + 1);
-    };
-  
-    newSocket.onerror = (error) => {
-      // console.error("❌ Erreur WebSocket :", error);
-    };
-  
-    newSocket.onclose = (event) => {
-      // console.warn("⚠️ WebSocket fermée :", event.reason);
-      if (socket.current === newSocket) {
-        connectedUserId.current = null;
-        socket.current = null;
-      }
-    };
-  
+    });
+
     return () => {
-      // console.log("🧹 Cleanup socket...");
-      if (socket.current === newSocket) {
-        newSocket.close();
-        socket.current = null;
-        connectedUserId.current = null;
-      }
+      removeListener();
+      closeRealtimeSocket();
     };
   }, [isLoggedIn, userId]);
 
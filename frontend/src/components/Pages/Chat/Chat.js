@@ -6,6 +6,20 @@ import { PaperAirplaneIcon } from "@heroicons/react/24/solid";
 import VideoCall from "./utils/VideoCall";
 import DatePlanner from "./utils/DatePlanner";
 import { showErrorToast } from "../../../utils/showErrorToast";
+import {
+  openRealtimeSocket,
+  onFrame,
+  sendRead,
+  sendTyping,
+  subscribeConversation,
+  unsubscribeConversation,
+} from "../../../utils/realtimeSocket";
+
+const MESSAGES_PAGE_SIZE = 50;
+const API_URL = "/api";
+
+// Les miniatures sont servies par l'API (/profile/thumbnail/{id})
+const avatarUrl = (chat) => (chat?.avatar ? `${API_URL}${chat.avatar}` : "/images/avatar-default.png");
 
 const Chat = () => {
   const { userId } = useAuth();
@@ -17,11 +31,13 @@ const Chat = () => {
   const [typingDots, setTypingDots] = useState("");
   const [isMobileView, setIsMobileView] = useState(window.innerWidth < 768);
   const [showChatView, setShowChatView] = useState(false);
-  const socket = useRef(null);
+  const conversationCleanup = useRef(null);
   const messagesEndRef = useRef(null);
   const navigate = useNavigate();
   const [showDateModal, setShowDateModal] = useState(false);
   const [latestDateStatus, setLatestDateStatus] = useState(null);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const lastMessageId = useRef(null);
 
   useEffect(() => {
     const handleResize = () => {
@@ -34,7 +50,7 @@ const Chat = () => {
     return () => window.removeEventListener("resize", handleResize);
   }, []);
 
-  useEffect(() => () => socket.current?.close(), []);
+  useEffect(() => () => conversationCleanup.current?.(), []);
 
   useEffect(() => {
     const fetchConversations = async () => {
@@ -63,10 +79,13 @@ const Chat = () => {
       const fetchMessagesAndStatus = async () => {
         try {
           const [messagesRes, statusRes] = await Promise.all([
-            secureApiCall(`/chat/messages/${selectedChat.id}`),
+            secureApiCall(`/chat/messages/${selectedChat.id}?limit=${MESSAGES_PAGE_SIZE}`),
             secureApiCall(`/chat/date_invite/status?chat_id=${selectedChat.id}`, "GET"),
           ]);
           setMessages(messagesRes);
+          setHasOlderMessages(messagesRes.length === MESSAGES_PAGE_SIZE);
+          lastMessageId.current = messagesRes.length ? messagesRes[messagesRes.length - 1].id : null;
+          markRead(selectedChat.id, lastMessageId.current);
           scrollToBottom();
           connectWebSocket(selectedChat.id);
 
@@ -87,8 +106,8 @@ const Chat = () => {
       };
 
       fetchMessagesAndStatus();
-    } else if (socket.current) {
-      socket.current.close();
+    } else {
+      conversationCleanup.current?.();
     }
   }, [selectedChat]);
 
@@ -98,33 +117,99 @@ const Chat = () => {
       return;
     }
 
-    if (socket.current) socket.current.close();
-    socket.current = new WebSocket(`wss://${window.location.host}/chat/ws/${chatId}`);
-    socket.current.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      if (data.event === "typing") {
+    // Abonnement à la conversation sur la socket temps réel partagée
+    conversationCleanup.current?.();
+    openRealtimeSocket();
+    const forChat = (callback) => (frame) => {
+      if (frame.conversation_id === chatId) callback(frame.data);
+    };
+    const receiveMessage = (data) => {
+      if (data.id && data.id <= lastMessageId.current) return; // Déjà reçu au rattrapage
+      if (data.id) {
+        lastMessageId.current = data.id;
+        markRead(chatId, data.id);
+      }
+      setMessages((prev) => [...prev, data]);
+      if (data.type === "date_invite") {
+        setLatestDateStatus(data.status);
+      }
+      scrollToBottom();
+    };
+    const handleMessage = forChat(receiveMessage);
+    const removeListeners = [
+      // Rattrapage des messages arrivés avant l'abonnement (ou pendant une reconnexion)
+      onFrame("subscribed", forChat(() => fetchNewerMessages(chatId))),
+      onFrame("typing", forChat((data) => {
         setTypingUsers((prev) => {
           const updated = new Set(prev);
           data.typing ? updated.add(data.username) : updated.delete(data.username);
           return new Set(updated);
         });
-      } else if (data.type === "date_result") {
+      })),
+      onFrame("date_result", forChat((data) => {
         // Affichage direct dans le chat sous forme de message système
-        const dateMessage = {
+        receiveMessage({
+          id: data.id,
           sender_id: 0, // 0 = système
           content: data.message,
           type: "system",
           timestamp: new Date().toISOString(),
-        };
-        setMessages((prev) => [...prev, dateMessage]);
-      } else {
-        setMessages((prev) => [...prev, data]);
-        if (data.type === "date_invite") {
-          setLatestDateStatus(data.status);
-        }
+        });
+      })),
+      onFrame("message", handleMessage),
+      onFrame("date_invite", handleMessage),
+    ];
+    subscribeConversation(chatId);
+
+    conversationCleanup.current = () => {
+      removeListeners.forEach((remove) => remove());
+      unsubscribeConversation(chatId);
+      conversationCleanup.current = null;
+    };
+  };
+
+  const fetchNewerMessages = async (chatId) => {
+    if (lastMessageId.current === null) return;
+    try {
+      const newer = await secureApiCall(`/chat/messages/${chatId}?after_id=${lastMessageId.current}`);
+      const unseen = newer.filter((msg) => msg.id > lastMessageId.current);
+      if (unseen.length) {
+        lastMessageId.current = unseen[unseen.length - 1].id;
+        markRead(chatId, lastMessageId.current);
+        setMessages((prev) => [...prev, ...unseen]);
         scrollToBottom();
       }
-    };
+    } catch (error) {
+      showErrorToast("Erreur récupération messages");
+    }
+  };
+
+  // Filigrane de lecture : le badge de la conversation est remis à zéro tout de suite
+  const markRead = async (chatId, messageId) => {
+    if (!messageId) return;
+    setConversations((prev) =>
+      prev.map((chat) => (chat.id === chatId ? { ...chat, unread_count: 0 } : chat))
+    );
+    if (sendRead(chatId, messageId)) return;
+    try {
+      await secureApiCall("/chat/read", "POST", { chat_id: chatId, message_id: messageId });
+    } catch (error) {
+      showErrorToast("Erreur lecture messages");
+    }
+  };
+
+  const loadOlderMessages = async () => {
+    const oldest = messages.find((msg) => msg.id);
+    if (!oldest) return;
+    try {
+      const older = await secureApiCall(
+        `/chat/messages/${selectedChat.id}?before_id=${oldest.id}&limit=${MESSAGES_PAGE_SIZE}`
+      );
+      setHasOlderMessages(older.length === MESSAGES_PAGE_SIZE);
+      setMessages((prev) => [...older, ...prev]);
+    } catch (error) {
+      showErrorToast("Erreur récupération messages");
+    }
   };
 
   const sendMessage = async () => {
@@ -141,6 +226,7 @@ const Chat = () => {
   };
 
   const notifyTyping = async (isTyping) => {
+    if (sendTyping(selectedChat.id, isTyping)) return;
     try {
       await secureApiCall("/chat/typing", "POST", {
         chat_id: selectedChat.id,
@@ -183,12 +269,16 @@ const Chat = () => {
                 onClick={() => handleSelectChat(chat)}
               >
                 <img
-                  src={chat.avatar || "/images/avatar-default.png"}
+                  src={avatarUrl(chat)}
                   alt={chat.name}
                   className="w-10 h-10 rounded-full object-cover"
                 />
                 <div className="flex-1 overflow-hidden">
                   <p className="truncate font-semibold">{chat.name}</p>
+                  <p className="truncate text-xs text-gray-400">
+                    {chat.last_message_sender_id === userId ? "Vous : " : ""}
+                    {chat.last_message || ""}
+                  </p>
                   <p
                     className={`text-sm ${
                       chat.isOnline ? "text-green-400" : "text-gray-500"
@@ -197,6 +287,11 @@ const Chat = () => {
                     {chat.isOnline ? "Connecté" : "Déconnecté"}
                   </p>
                 </div>
+                {chat.unread_count > 0 && (
+                  <span className="bg-red-500 text-white text-xs font-bold rounded-full px-2 py-0.5">
+                    {chat.unread_count}
+                  </span>
+                )}
               </div>
             ))}
           </div>
@@ -219,7 +314,7 @@ const Chat = () => {
                   }
                 >
                   <img
-                    src={selectedChat.avatar || "/images/avatar-default.png"}
+                    src={avatarUrl(selectedChat)}
                     alt={selectedChat.name}
                     className="w-10 h-10 sm:w-12 sm:h-12 rounded-full object-cover border border-gray-700"
                   />
@@ -276,6 +371,16 @@ const Chat = () => {
 
               {/* Messages */}
               <div className="flex-1 overflow-y-auto p-4 space-y-2">
+                {hasOlderMessages && (
+                  <div className="flex justify-center">
+                    <button
+                      onClick={loadOlderMessages}
+                      className="bg-gray-800 text-white px-3 py-1 rounded text-xs"
+                    >
+                      Charger les messages précédents
+                    </button>
+                  </div>
+                )}
                 {messages.map((msg, index) => {
                   const isSystem = msg.type === "system" || msg.type === "date_result";
                   const isMe = msg.sender_id === userId;
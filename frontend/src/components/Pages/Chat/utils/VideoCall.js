@@ -6,6 +6,14 @@ import React, {
     forwardRef,
   } from "react";
   import { showErrorToast } from "../../../../utils/showErrorToast";
+  import {
+    isRealtimeSocketOpen,
+    onFrame,
+    openRealtimeSocket,
+    sendVideoSignal,
+    subscribeConversation,
+    unsubscribeConversation,
+  } from "../../../../utils/realtimeSocket";
   
   const VideoCall = forwardRef(({ userId, chatId, otherUserId }, ref) => {
     const [inCall, setInCall] = useState(false);
@@ -16,43 +24,9 @@ import React, {
     const peerRef = useRef(null);
     const localStream = useRef(null);
     const iceQueue = useRef([]);
-    const videoSocket = useRef(null);
-    const lastChatIdRef = useRef(null);
+    const signalingHandler = useRef(null);
     const hasEndedRef = useRef(false);
   
-    const connectVideoSocket = () => {
-        if (!chatId) {
-          // console.warn("⛔ Impossible d'ouvrir la socket vidéo : utilisateur ou chatId invalide");
-          return;
-        }
-        if (videoSocket.current && videoSocket.current.readyState <= 1) {
-            // console.log("🔁 Socket déjà ouverte ou en cours");
-            return;
-          }
-      
-        // console.log("🔗 Connexion WebSocket vidéo sur chat", chatId);
-        videoSocket.current = new WebSocket(
-          `wss://${window.location.host}/chat/ws/video/${chatId}`
-        );
-      
-        videoSocket.current.onopen = () => {
-          // console.log("✅ WebSocket vidéo connectée");
-        };
-      
-        videoSocket.current.onmessage = async (event) => {
-          const data = JSON.parse(event.data);
-          handleSignalingData(data);
-        };
-      
-        videoSocket.current.onclose = () => {
-          // console.log("❌ WebSocket vidéo fermée");
-        };
-      
-        videoSocket.current.onerror = (error) => {
-          // console.error("Erreur WebSocket vidéo :", error);
-        };
-      };
-  
     const startCall = () => {
       hasEndedRef.current = false;
       setInCall(false);
@@ -60,13 +34,11 @@ import React, {
       setError(null);
       peerRef.current = null;
       localStream.current = null;
-      videoSocket.current?.send(
-        JSON.stringify({
-          event: "call_request",
-          from_user_id: userId,
-          to_user_id: otherUserId,
-        })
-      );
+      sendVideoSignal(chatId, {
+        event: "call_request",
+        from_user_id: userId,
+        to_user_id: otherUserId,
+      });
     };
   
     const acceptCall = async () => {
@@ -75,14 +47,12 @@ import React, {
       setInCall(true);
       try {
         await initWebRTC(true);
-        videoSocket.current.send(
-          JSON.stringify({
-            event: "call_response",
-            accepted: true,
-            from_user_id: userId,
-            to_user_id: otherUserId,
-          })
-        );
+        sendVideoSignal(chatId, {
+          event: "call_response",
+          accepted: true,
+          from_user_id: userId,
+          to_user_id: otherUserId,
+        });
       } catch (err) {
         setError("Permission denied or device unavailable");
         endCall();
@@ -91,14 +61,12 @@ import React, {
   
     const rejectCall = () => {
       setIncomingCall(false);
-      videoSocket.current?.send(
-        JSON.stringify({
-          event: "call_response",
-          accepted: false,
-          from_user_id: userId,
-          to_user_id: otherUserId,
-        })
-      );
+      sendVideoSignal(chatId, {
+        event: "call_response",
+        accepted: false,
+        from_user_id: userId,
+        to_user_id: otherUserId,
+      });
     };
   
     const endCall = () => {
@@ -118,14 +86,12 @@ import React, {
         setInCall(false);
         setIncomingCall(false);
       
-        if (videoSocket.current?.readyState === WebSocket.OPEN) {
-          videoSocket.current.send(
-            JSON.stringify({
-              event: "call_cancel",
-              from_user_id: userId,
-              to_user_id: otherUserId,
-            })
-          );
+        if (isRealtimeSocketOpen()) {
+          sendVideoSignal(chatId, {
+            event: "call_cancel",
+            from_user_id: userId,
+            to_user_id: otherUserId,
+          });
         }
       };
   
@@ -156,14 +122,12 @@ import React, {
   
       peerRef.current.onicecandidate = (e) => {
         if (e.candidate) {
-          videoSocket.current.send(
-            JSON.stringify({
-              event: "ice-candidate",
-              candidate: e.candidate,
-              from_user_id: userId,
-              to_user_id: otherUserId,
-            })
-          );
+          sendVideoSignal(chatId, {
+            event: "ice-candidate",
+            candidate: e.candidate,
+            from_user_id: userId,
+            to_user_id: otherUserId,
+          });
         }
       };
   
@@ -177,14 +141,12 @@ import React, {
       if (!isReceiver) {
         const offer = await peerRef.current.createOffer();
         await peerRef.current.setLocalDescription(offer);
-        videoSocket.current.send(
-          JSON.stringify({
-            event: "offer",
-            offer,
-            from_user_id: userId,
-            to_user_id: otherUserId,
-          })
-        );
+        sendVideoSignal(chatId, {
+          event: "offer",
+          offer,
+          from_user_id: userId,
+          to_user_id: otherUserId,
+        });
       }
     };
   
@@ -222,14 +184,12 @@ import React, {
           );
           const answer = await peerRef.current.createAnswer();
           await peerRef.current.setLocalDescription(answer);
-          videoSocket.current.send(
-            JSON.stringify({
-              event: "answer",
-              answer,
-              from_user_id: userId,
-              to_user_id: data.from_user_id,
-            })
-          );
+          sendVideoSignal(chatId, {
+            event: "answer",
+            answer,
+            from_user_id: userId,
+            to_user_id: data.from_user_id,
+          });
           break;
         case "answer":
           if (peerRef.current) {
@@ -250,6 +210,7 @@ import React, {
       }
     };
   
+    signalingHandler.current = handleSignalingData;
     useImperativeHandle(ref, () => ({ handleSignalingData }));
   
     useEffect(() => {
@@ -262,44 +223,19 @@ import React, {
         }
       }, [error]);
 
+      // Signalisation via la socket temps réel partagée (trames "video" de la conversation)
       useEffect(() => {
         if (!chatId || !otherUserId) return;
-      
-        const shouldNotClose =
-          lastChatIdRef.current === null || lastChatIdRef.current === chatId;
-      
-        if (!shouldNotClose) {
-          // On change de chat → fermer l’ancienne socket
-          if (
-            videoSocket.current &&
-            (videoSocket.current.readyState === WebSocket.OPEN ||
-              videoSocket.current.readyState === WebSocket.CONNECTING)
-          ) {
-            // console.log("🧹 Fermeture socket pour ancien chat", lastChatIdRef.current);
-            videoSocket.current.close();
-          }
-          videoSocket.current = null;
-        }
-      
-        if (!videoSocket.current || videoSocket.current.readyState > 1) {
-          // console.log("🔗 Connexion WebSocket vidéo sur chat", chatId);
-          connectVideoSocket();
-        }
-      
-        lastChatIdRef.current = chatId;
-      
+
+        openRealtimeSocket();
+        subscribeConversation(chatId);
+        const removeListener = onFrame("video", (frame) => {
+          if (frame.conversation_id === chatId) signalingHandler.current(frame.data);
+        });
+
         return () => {
-          if (
-            lastChatIdRef.current !== null &&
-            lastChatIdRef.current !== chatId &&
-            videoSocket.current &&
-            (videoSocket.current.readyState === WebSocket.OPEN ||
-              videoSocket.current.readyState === WebSocket.CONNECTING)
-          ) {
-            // console.log("🔌 Fermeture WebSocket vidéo pour chat", chatId);
-            videoSocket.current.close();
-            videoSocket.current = null;
-          }
+          removeListener();
+          unsubscribeConversation(chatId);
         };
       }, [chatId, otherUserId]);
   
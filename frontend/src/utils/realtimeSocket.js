@@ -0,0 +1,98 @@
+// Socket unique par onglet (/realtime/ws) : messages, frappe, invitations,
+// signalisation vidéo et notifications arrivent sous forme de trames typées
+// {type, conversation_id?, data}. Les composants s'y abonnent par type de trame.
+
+const RECONNECT_DELAY_MS = 2000;
+
+let socket = null;
+let shouldReconnect = false;
+let reconnectTimer = null;
+const listeners = new Map(); // type de trame -> Set de callbacks
+const conversations = new Map(); // conversation_id -> nombre d'abonnés côté client
+
+const sendFrame = (frame) => {
+  if (socket?.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify(frame));
+    return true;
+  }
+  return false;
+};
+
+const dispatch = (type, frame) => {
+  (listeners.get(type) || []).forEach((callback) => callback(frame));
+};
+
+const connect = () => {
+  socket = new WebSocket(`wss://${window.location.host}/realtime/ws`);
+
+  socket.onopen = () => {
+    // Réabonnement après (re)connexion
+    conversations.forEach((_, conversationId) =>
+      sendFrame({ type: "subscribe", conversation_id: conversationId })
+    );
+    dispatch("open", {});
+  };
+
+  socket.onmessage = (event) => {
+    const frame = JSON.parse(event.data);
+    dispatch(frame.type, frame);
+  };
+
+  socket.onclose = () => {
+    socket = null;
+    if (shouldReconnect) {
+      reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+    }
+  };
+};
+
+export const openRealtimeSocket = () => {
+  shouldReconnect = true;
+  if (!socket) connect();
+};
+
+export const closeRealtimeSocket = () => {
+  shouldReconnect = false;
+  clearTimeout(reconnectTimer);
+  socket?.close();
+  socket = null;
+  conversations.clear();
+};
+
+// Retourne une fonction de désabonnement (à appeler au démontage du composant)
+export const onFrame = (type, callback) => {
+  if (!listeners.has(type)) listeners.set(type, new Set());
+  listeners.get(type).add(callback);
+  return () => listeners.get(type).delete(callback);
+};
+
+export const subscribeConversation = (conversationId) => {
+  conversations.set(conversationId, (conversations.get(conversationId) || 0) + 1);
+  if (conversations.get(conversationId) === 1) {
+    sendFrame({ type: "subscribe", conversation_id: conversationId });
+  }
+};
+
+export const unsubscribeConversation = (conversationId) => {
+  const count = (conversations.get(conversationId) || 0) - 1;
+  if (count > 0) {
+    conversations.set(conversationId, count);
+    return;
+  }
+  conversations.delete(conversationId);
+  sendFrame({ type: "unsubscribe", conversation_id: conversationId });
+};
+
+// Signal de frappe : le serveur ne diffuse que les débuts et fins de frappe.
+// Retourne false si la socket n'est pas ouverte (repli sur POST /chat/typing).
+export const sendTyping = (conversationId, typing) =>
+  sendFrame({ type: "typing", conversation_id: conversationId, typing });
+
+// Lecture jusqu'au message messageId inclus (un upsert du filigrane côté serveur)
+export const sendRead = (conversationId, messageId) =>
+  sendFrame({ type: "read", conversation_id: conversationId, message_id: messageId });
+
+export const sendVideoSignal = (conversationId, data) =>
+  sendFrame({ type: "video", conversation_id: conversationId, data });
+
+export const isRealtimeSocketOpen = () => socket?.readyState === WebSocket.OPEN;
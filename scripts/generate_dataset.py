@@ -0,0 +1,315 @@
+"""
+Générateur de données synthétiques à grande échelle (10k à 5M utilisateurs).
+
+Produit, de façon reproductible (graine fixe), des utilisateurs avec profils,
+localisations, likes, blocages, conversations, messages et notifications cohérents,
+puis les charge avec COPY par lots, en parallèle sur plusieurs processus.
+
+Le chargement se fait en deux phases (chaque lot est une transaction) :
+1. users, profiles, locations : toutes les cibles des relations existent ensuite ;
+2. likes, blocks, conversations, messages, notifications.
+
+Les données d'un lot ne dépendent que de (graine, phase, numéro de lot) : le résultat
+est identique quel que soit le nombre de processus. Les photos ne sont pas générées
+(voir insert_images.py).
+
+Exemple (tables déjà créées par le backend) :
+
+    python scripts/generate_dataset.py --users 1000000 --workers 8
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from multiprocessing import Pool
+import psycopg2
+
+DB_PARAMS = {
+    "dbname": os.getenv("POSTGRES_DB"),
+    "user": os.getenv("POSTGRES_USER"),
+    "password": os.getenv("POSTGRES_PASSWORD"),
+    "host": os.getenv("POSTGRES_HOST"),
+    "port": os.getenv("POSTGRES_PORT"),
+}
+
+GRID_CELL_DEGREES = 0.5  # Doit correspondre à app/tables/locations.py
+
+FIRST_NAMES = {
+    "male": ["Adam", "Bruno", "Carlos", "David", "Erik", "Felix", "Hugo", "Ivan", "Jonas", "Karim",
+             "Leo", "Marco", "Nils", "Omar", "Paul", "Rafael", "Samuel", "Theo", "Victor", "Yann"],
+    "female": ["Alice", "Chloe", "Donna", "Elena", "Fatima", "Grace", "Hana", "Ines", "Julia", "Lea",
+               "Maya", "Nina", "Olivia", "Pam", "Rosa", "Sherry", "Sofia", "Tess", "Vera", "Zoe"],
+}
+LAST_NAMES = ["Adams", "Bernard", "Brown", "Chan", "Dubois", "Espinoza", "Garcia", "Keller", "Lambert",
+              "Martin", "Meier", "Moreau", "Muller", "Nguyen", "Petit", "Rossi", "Schmid", "Silva",
+              "Todd", "Weber"]
+TAGS = ["music", "sport", "travel", "cinema", "cooking", "reading", "gaming", "hiking", "art",
+        "photography", "dance", "yoga", "technology", "fashion", "animals", "nature", "wine",
+        "coffee", "theatre", "climbing", "cycling", "swimming", "running", "meditation", "vegan"]
+# (ville, pays, latitude, longitude, poids) : les utilisateurs sont regroupés autour des villes
+CITIES = [
+    ("Paris", "France", 48.8566, 2.3522, 10), ("Lyon", "France", 45.7640, 4.8357, 4),
+    ("Marseille", "France", 43.2965, 5.3698, 4), ("Genève", "Switzerland", 46.2044, 6.1432, 3),
+    ("Lausanne", "Switzerland", 46.5197, 6.6323, 2), ("Martigny", "Switzerland", 46.1028, 7.0727, 1),
+    ("Zürich", "Switzerland", 47.3769, 8.5417, 3), ("Bruxelles", "Belgium", 50.8503, 4.3517, 3),
+    ("Berlin", "Germany", 52.5200, 13.4050, 5), ("Madrid", "Spain", 40.4168, -3.7038, 5),
+    ("Rome", "Italy", 41.9028, 12.4964, 4), ("London", "United Kingdom", 51.5074, -0.1278, 8),
+    ("Montréal", "Canada", 45.5017, -73.5673, 3), ("New York", "United States", 40.7128, -74.0060, 8),
+    ("Tokyo", "Japan", 35.6762, 139.6503, 6), ("Sydney", "Australia", -33.8688, 151.2093, 3),
+]
+CITY_WEIGHTS = [city[4] for city in CITIES]
+CITY_SPREAD_DEGREES = 0.3  # Écart-type de la dispersion autour du centre-ville
+MESSAGES = ["Salut !", "Comment ça va ?", "Tu fais quoi ce week-end ?", "Haha 😄", "Avec plaisir",
+            "On se voit quand ?", "J'adore ta photo", "Bonne soirée !", "Tu connais ce resto ?", "À demain"]
+
+# Volumétrie moyenne par utilisateur
+LIKES_PER_USER = 8
+MAX_MATCHES_PER_USER = 3  # Borne aussi la plage d'ids de conversations réservée par utilisateur
+BLOCK_PROBABILITY = 0.05
+UNLIKE_PROBABILITY = 0.02
+MAX_MESSAGES_PER_CONVERSATION = 30
+
+NOW = datetime.now(timezone.utc)
+
+def copy_rows(cur, table: str, columns: list[str], rows: list[tuple]):
+    """Charge des lignes avec COPY ... FROM STDIN (format CSV, chaîne vide = NULL)."""
+    if not rows:
+        return
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def pg_array(values) -> str:
+    """Littéral de tableau Postgres (ex. {1,2,3})."""
+    return "{" + ",".join(str(v) for v in values) + "}"
+
+def random_timestamp(rng: random.Random, max_days: int = 365) -> datetime:
+    return NOW - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+def user_gender(user_id: int, seed: int) -> str:
+    """Genre déterministe d'un utilisateur (réutilisé pour générer les matchs en phase 2)."""
+    return "male" if random.Random(f"{seed}:gender:{user_id}").random() < 0.5 else "female"
+
+def user_preference(user_id: int, seed: int) -> str:
+    """Préférence déterministe d'un utilisateur (réutilisée pour générer les matchs en phase 2)."""
+    return random.Random(f"{seed}:preference:{user_id}").choices(
+        ["heterosexual", "homosexual", "bisexual"], weights=[75, 10, 15]
+    )[0]
+
+def shows_in_discovery(user_id: int, other_id: int, seed: int) -> bool:
+    """
+    other_id fait-il partie des profils proposés à user_id ? Même règle que
+    ORIENTATION_CLAUSES (app/match/match_service.py) : le même genre est cherché par
+    les homo/bi et doit être homo/bi, le sexe opposé par les hétéro/bi et doit être hétéro/bi.
+    """
+    same_gender = user_gender(user_id, seed) == user_gender(other_id, seed)
+    wanted = ("homosexual", "bisexual") if same_gender else ("heterosexual", "bisexual")
+    return user_preference(user_id, seed) in wanted and user_preference(other_id, seed) in wanted
+
+def generate_users(rng, seed, start_id, end_id, tag_ids):
+    """Phase 1 : lignes users, profiles et locations des ids [start_id, end_id)."""
+    users, profiles, locations = [], [], []
+    for user_id in range(start_id, end_id):
+        gender = user_gender(user_id, seed)
+        first_name = rng.choice(FIRST_NAMES[gender])
+        last_name = rng.choice(LAST_NAMES)
+        created_at = random_timestamp(rng)
+        users.append((
+            user_id, f"{first_name.lower()}.{last_name.lower()}{user_id}@example.com",
+            f"{first_name.lower()}{last_name.lower()}{user_id}", first_name, last_name,
+            "fake_hash", created_at.isoformat(), rng.random() < 0.2,
+            random_timestamp(rng, 30).isoformat(), True,
+        ))
+
+        preference = user_preference(user_id, seed)
+        interests = rng.sample(TAGS, rng.randint(1, 6))
+        birthday = date.today() - timedelta(days=rng.randint(18 * 365 + 5, 60 * 365))
+        profiles.append((
+            user_id, gender, preference, f"Bio de {first_name}", json.dumps(interests),
+            birthday.isoformat(), rng.randint(0, 50), pg_array(sorted(tag_ids[t] for t in interests)),
+        ))
+
+        city, country, city_lat, city_lon, _ = rng.choices(CITIES, weights=CITY_WEIGHTS)[0]
+        latitude = max(-90.0, min(90.0, rng.gauss(city_lat, CITY_SPREAD_DEGREES)))
+        longitude = (rng.gauss(city_lon, CITY_SPREAD_DEGREES) + 180) % 360 - 180
+        locations.append((
+            user_id, round(latitude, 6), round(longitude, 6), city, country,
+            rng.choice(["GPS", "IP"]), rng.random() < 0.7, random_timestamp(rng, 30).isoformat(),
+            math.floor(latitude / GRID_CELL_DEGREES), math.floor(longitude / GRID_CELL_DEGREES),
+        ))
+    return users, profiles, locations
+
+def generate_relations(rng, seed, start_id, end_id, first_id, last_id, conversation_base):
+    """
+    Phase 2 : relations dont l'initiateur est dans [start_id, end_id).
+    Chaque like (liker, liked) est généré par le lot du liker : pas de doublon entre lots.
+    Un match (u, v) n'est généré que par u, avec v dans le même lot (u < v), ce qui fixe
+    les deux sens du like ; les ids de conversation sont réservés par utilisateur.
+    """
+    likes, blocks, conversations, messages, notifications = {}, [], [], [], []
+
+    for user_id in range(start_id, end_id):
+        # Matchs : partenaires compatibles dans les deux sens (orientation), dans le même lot
+        partners = set()
+        for _ in range(rng.randint(0, MAX_MATCHES_PER_USER)):
+            partner_id = rng.randint(user_id + 1, end_id) if user_id + 1 < end_id else None
+            if (partner_id is None or partner_id >= end_id or partner_id in partners
+                    or not shows_in_discovery(user_id, partner_id, seed)
+                    or not shows_in_discovery(partner_id, user_id, seed)):
+                continue
+            partners.add(partner_id)
+
+        for index, partner_id in enumerate(sorted(partners)):
+            matched_at = random_timestamp(rng, 180)
+            likes[(user_id, partner_id)] = (matched_at - timedelta(days=rng.randint(0, 10)), False)
+            likes[(partner_id, user_id)] = (matched_at, False)
+            notifications.append((user_id, partner_id, "like", "Nouveau like ❤️", matched_at.isoformat(), True))
+            notifications.append((user_id, partner_id, "match", "Nouveau match ! 🎉", matched_at.isoformat(), True))
+            notifications.append((partner_id, user_id, "match", "Nouveau match ! 🎉", matched_at.isoformat(), True))
+
+            conversation_id = conversation_base + (user_id - first_id) * MAX_MATCHES_PER_USER + index
+            conversations.append((conversation_id, user_id, partner_id, matched_at.isoformat()))
+            sent_at = matched_at
+            count = rng.randint(0, MAX_MESSAGES_PER_CONVERSATION)
+            for position in range(count):
+                sent_at += timedelta(seconds=rng.randint(10, 6 * 3600))
+                sender_id, receiver_id = rng.choice([(user_id, partner_id), (partner_id, user_id)])
+                is_read = position < count - 3 or rng.random() < 0.5
+                messages.append((conversation_id, sender_id, rng.choice(MESSAGES), sent_at.isoformat(), is_read, "message"))
+                if not is_read:
+                    notifications.append((receiver_id, sender_id, "message", "Nouveau message 💬", sent_at.isoformat(), False))
+
+        # Likes à sens unique vers n'importe quel utilisateur
+        for _ in range(rng.randint(0, 2 * LIKES_PER_USER)):
+            liked_id = rng.randint(first_id, last_id)
+            if liked_id == user_id or (user_id, liked_id) in likes:
+                continue
+            liked_at = random_timestamp(rng, 180)
+            likes[(user_id, liked_id)] = (liked_at, rng.random() < UNLIKE_PROBABILITY)
+            notifications.append((liked_id, user_id, "like", "Nouveau like ❤️", liked_at.isoformat(), rng.random() < 0.8))
+
+        if rng.random() < BLOCK_PROBABILITY:
+            blocked_id = rng.randint(first_id, last_id)
+            if blocked_id != user_id:
+                blocks.append((user_id, blocked_id, random_timestamp(rng, 90).isoformat()))
+
+    like_rows = [
+        (liker_id, liked_id, liked_at.isoformat(), unlike)
+        for (liker_id, liked_id), (liked_at, unlike) in likes.items()
+    ]
+    return like_rows, blocks, conversations, messages, notifications
+
+def load_batch(job):
+    """Génère et charge un lot (exécuté dans un processus du pool). Retourne le nombre de lignes."""
+    phase, batch_index, start_id, end_id, options = job
+    rng = random.Random(f"{options['seed']}:{phase}:{batch_index}")
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with conn, conn.cursor() as cur:
+            if phase == 1:
+                users, profiles, locations = generate_users(
+                    rng, options["seed"], start_id, end_id, options["tag_ids"]
+                )
+                copy_rows(cur, "users", ["id", "email", "username", "first_name", "last_name", "password_hash",
+                                         "created_at", "status", "laste_connexion", "email_verified"], users)
+                copy_rows(cur, "profiles", ["user_id", "gender", "sexual_preferences", "biography", "interests",
+                                            "birthday", "fame_rating", "tag_ids"], profiles)
+                copy_rows(cur, "locations", ["user_id", "latitude", "longitude", "city", "country",
+                                             "location_method", "map_enabled", "last_updated",
+                                             "grid_lat", "grid_lon"], locations)
+                return len(users) + len(profiles) + len(locations)
+
+            likes, blocks, conversations, messages, notifications = generate_relations(
+                rng, options["seed"], start_id, end_id,
+                options["first_id"], options["last_id"], options["conversation_base"]
+            )
+            copy_rows(cur, "likes", ["liker_id", "liked_id", "created_at", "unlike"], likes)
+            copy_rows(cur, "blocks", ["blocker_id", "blocked_id", "created_at"], blocks)
+            copy_rows(cur, "conversations", ["id", "user1_id", "user2_id", "created_at"], conversations)
+            copy_rows(cur, "messages", ["conversation_id", "sender_id", "content", "timestamp", "is_read", "type"], messages)
+            copy_rows(cur, "notifications", ["receiver_id", "sender_id", "type", "context", "timestamp", "is_read"], notifications)
+            return len(likes) + len(blocks) + len(conversations) + len(messages) + len(notifications)
+    finally:
+        conn.close()
+
+def prepare(cur) -> tuple[int, int, dict]:
+    """Crée les tags manquants et retourne (premier id user libre, premier id conversation libre, tags)."""
+    cur.execute(
+        "INSERT INTO tags (name) SELECT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING;", (TAGS,)
+    )
+    cur.execute("SELECT name, id FROM tags WHERE name = ANY(%s);", (TAGS,))
+    tag_ids = dict(cur.fetchall())
+    cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users;")
+    first_id = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM conversations;")
+    conversation_base = cur.fetchone()[0]
+    return first_id, conversation_base, tag_ids
+
+def finalize(cur):
+    """Recale les séquences (ids explicites insérés par COPY), remplit les filigranes de lecture et met à jour les statistiques."""
+    for table in ("users", "conversations"):
+        cur.execute(f"SELECT setval('{table}_id_seq', (SELECT COALESCE(MAX(id), 1) FROM {table}));")
+    # Filigranes de lecture et compteurs de non lus (tenus par l'API, calculés ici une fois)
+    cur.execute("""
+        INSERT INTO conversation_reads (conversation_id, user_id, last_read_message_id, unread_count)
+        SELECT c.id, participant.user_id,
+               COALESCE(MAX(m.id) FILTER (WHERE m.is_read OR m.sender_id = participant.user_id), 0),
+               COUNT(m.id) FILTER (WHERE m.sender_id IS DISTINCT FROM participant.user_id AND NOT m.is_read)
+        FROM conversations c
+        CROSS JOIN LATERAL (VALUES (c.user1_id), (c.user2_id)) AS participant(user_id)
+        LEFT JOIN messages m ON m.conversation_id = c.id
+        GROUP BY c.id, participant.user_id
+        ON CONFLICT DO NOTHING;
+    """)
+    for table in ("users", "profiles", "locations", "likes", "blocks", "conversations", "messages",
+                  "conversation_reads", "notifications"):
+        cur.execute(f"ANALYZE {table};")
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère et charge un jeu de données Matcha synthétique.")
+    parser.add_argument("--users", type=int, default=10_000, help="nombre d'utilisateurs à créer")
+    parser.add_argument("--seed", type=int, default=42, help="graine (même graine = mêmes données)")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="utilisateurs par lot COPY")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="processus de chargement")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    with conn, conn.cursor() as cur:
+        first_id, conversation_base, tag_ids = prepare(cur)
+    conn.close()  # Pas de connexion ouverte au moment du fork des processus
+    last_id = first_id + args.users - 1
+    options = {
+        "seed": args.seed,
+        "tag_ids": tag_ids,
+        "first_id": first_id,
+        "last_id": last_id,
+        "conversation_base": conversation_base,
+    }
+    batches = [
+        (index, start, min(start + args.batch_size, last_id + 1))
+        for index, start in enumerate(range(first_id, last_id + 1, args.batch_size))
+    ]
+    print(f"👥 {args.users} utilisateurs (ids {first_id}-{last_id}), {len(batches)} lots, {args.workers} processus")
+
+    with Pool(args.workers) as pool:
+        for phase, label in ((1, "utilisateurs, profils, localisations"),
+                             (2, "likes, blocages, conversations, messages, notifications")):
+            start = time.perf_counter()
+            jobs = [(phase, index, start_id, end_id, options) for index, start_id, end_id in batches]
+            rows = sum(pool.imap_unordered(load_batch, jobs))
+            print(f"✨ Phase {phase} ({label}) : {rows} lignes en {time.perf_counter() - start:.1f} s")
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    with conn, conn.cursor() as cur:
+        finalize(cur)
+    conn.close()
+    print("✅ Jeu de données synthétique chargé.")
+
+if __name__ == "__main__":
+    main()
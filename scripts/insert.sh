@@ -4,6 +4,13 @@ set -e
 echo "✨ Insertion directe du SQL..."
 psql postgresql://$POSTGRES_USER:$POSTGRES_PASSWORD@$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB -f /app/data/fake_profiles_insert.sql
 
+echo "🗺️ Calcul des cellules de la grille spatiale..."
+psql postgresql://$POSTGRES_USER:$POSTGRES_PASSWORD@$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB -c "UPDATE locations SET grid_lat = FLOOR(latitude / 0.5)::int, grid_lon = FLOOR(longitude / 0.5)::int;"
+
+echo "🏷️ Normalisation des tags d'intérêt..."
+psql postgresql://$POSTGRES_USER:$POSTGRES_PASSWORD@$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB -c "INSERT INTO tags (name) SELECT DISTINCT lower(trim(t)) FROM profiles, json_array_elements_text(profiles.interests::json) t WHERE trim(t) <> '' ON CONFLICT (name) DO NOTHING;"
+psql postgresql://$POSTGRES_USER:$POSTGRES_PASSWORD@$POSTGRES_HOST:$POSTGRES_PORT/$POSTGRES_DB -c "UPDATE profiles p SET tag_ids = ARRAY(SELECT DISTINCT tags.id FROM json_array_elements_text(p.interests::json) t JOIN tags ON tags.name = lower(trim(t)) ORDER BY tags.id);"
+
 echo "🖌️ Insertion des images compressées..."
 python /app/scripts/insert_images.py
 
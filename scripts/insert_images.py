@@ -5,6 +5,7 @@ from io import BytesIO
 from PIL import Image
 
 MAX_DIMENSION = 500  # pixels
+THUMBNAIL_DIMENSION = 240  # pixels, miniature pour les listes
 MALE_DIR = "/app/data/images/male"
 FEMALE_DIR = "/app/data/images/female"
 
@@ -17,14 +18,14 @@ DB_PARAMS = {
     "port": os.getenv("POSTGRES_PORT"),
 }
 
-def process_image(image_path: str) -> bytes:
+def process_image(image_path: str, max_dimension: int = MAX_DIMENSION, quality: int = 80) -> bytes:
     img = Image.open(image_path).convert("RGB")
     max_side = max(img.size)
-    scale = MAX_DIMENSION / max_side
+    scale = max_dimension / max_side
     new_size = tuple(int(dim * scale) for dim in img.size)
     img = img.resize(new_size, Image.LANCZOS)
     output = BytesIO()
-    img.save(output, format="JPEG", quality=80)
+    img.save(output, format="JPEG", quality=quality)
     return output.getvalue()
 
 def main():
@@ -47,13 +48,14 @@ def main():
         for i, img_name in enumerate(selected_imgs):
             path = os.path.join(img_dir, img_name)
             img_bytes = process_image(path)
+            thumb_bytes = process_image(path, THUMBNAIL_DIMENSION, quality=70)
 
             cur.execute(
                 """
-                INSERT INTO profile_pictures (user_id, image_data, is_profile_picture)
-                VALUES (%s, %s, %s);
+                INSERT INTO profile_pictures (user_id, image_data, thumbnail_data, is_profile_picture)
+                VALUES (%s, %s, %s, %s);
                 """,
-                (user_id, psycopg2.Binary(img_bytes), i == 0)
+                (user_id, psycopg2.Binary(img_bytes), psycopg2.Binary(thumb_bytes), i == 0)
             )
 
     conn.commit()